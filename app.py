@@ -1,31 +1,92 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
+import copy
+import hashlib
 import sys
 import json
-import time
+import re
 from datetime import datetime, timedelta
+from html import escape
 
 # Import the modules from the current directory
+# The chart modules (and plotly with them) are imported in the branch that draws each chart
 from data_processor import DataProcessor
-from line_chart import LineChart
-from bar_chart import BarChart
-from heatmap import HeatMap
 from tiktok_style import TikTokStyle
 
 st.set_page_config(page_title="GG Data Visualiser", page_icon="🎵", layout="wide")
 
+# A #rrggbb color, as entered in the line color table
+_HEX_COLOR_PATTERN = r"^#[0-9a-fA-F]{6}$"
+
+# Display formatters for metric values, bound once instead of building a lambda per cell
+_FORMAT_CURRENCY = '£{:,.2f}'.format
+_FORMAT_PERCENTAGE = '{:.2f}%'.format
+_FORMAT_NUMBER = '{:,.0f}'.format
+
+# Card values of 1K and up are shortened: np.digitize against the thresholds gives the index
+# into the divisor and suffix tables
+_SCALE_THRESHOLDS = np.array([1e3, 1e6])
+_SCALE_DIVISORS = np.array([1.0, 1e3, 1e6])
+_SCALE_SUFFIXES = np.array(["", "K", "M"])
+
+# Date filter presets: button label, widget key prefix and days back from the last date (None for all)
+_DATE_PRESETS = (("Last 7d", "7d", 7), ("Last 30d", "30d", 30), ("Last 90d", "90d", 90), ("All", "all", None))
+
+# Label parts for the % change table, indexed by change class (up, down, flat, no base)
+_CHANGE_PREFIXES = np.array(["🟢 +", "🔴 ", "⚪ ", "❓ "])
+_CHANGE_TEXT = np.array(["", "", "0.0%", "N/A"])
+
+# Base styles for the grouped overview tabs. Each tab is a hidden radio button, so switching
+# tabs is handled by the browser and never reruns the script
+_TABS_CSS = """
+    .overview-tabs { color: #ffffff; }
+    .overview-tabs > input { display: none; }
+    .overview-tabs > label {
+        display: inline-block; padding: 8px 14px; cursor: pointer; font-size: 14px;
+        color: #ffffff; border-bottom: 2px solid transparent;
+    }
+    .overview-tabs > .panel { display: none; padding-top: 12px; border-top: 1px solid #333333; }
+    """
+
+# Page-wide dark theme overrides, built once at import. It is still emitted on every
+# rerun, since Streamlit drops any element a rerun doesn't re-render
+_GLOBAL_CSS = """
+    <style>
+    .stApp {
+        background-color: #000000 !important;
+        color: #ffffff !important;
+    }
+    .stSidebar {
+        background-color: #111111 !important;
+    }
+    .stSelectbox label, .stMultiSelect label, .stFileUploader label {
+        color: #ffffff !important;
+    }
+    .stMarkdown {
+        color: #ffffff !important;
+    }
+    </style>
+    """
+
+
+@st.cache_resource(show_spinner=False)
+def _read_preferences():
+    """Read the saved preferences file once per process, shared by every session"""
+    try:
+        # Open directly rather than checking first; a missing file just means no saved preferences
+        with open('preferences/style_preferences.json', 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
 
 def load_preferences():
     """Load saved user preferences if they exist"""
     try:
-        # Create a preferences directory if it doesn't exist
-        os.makedirs('preferences', exist_ok=True)
-
-        # Check if preferences file exists
-        if os.path.exists('preferences/style_preferences.json'):
-            with open('preferences/style_preferences.json', 'r') as f:
-                return json.load(f)
+        # Each session gets its own copy, since the style keeps references to the lists inside
+        return copy.deepcopy(_read_preferences())
     except Exception as e:
         st.sidebar.warning(f"Could not load preferences: {e}")
 
@@ -38,36 +99,153 @@ def save_preferences(style_dict):
         # Create a preferences directory if it doesn't exist
         os.makedirs('preferences', exist_ok=True)
 
-        # Save preferences to a file
-        with open('preferences/style_preferences.json', 'w') as f:
+        # Write to a temporary file and swap it in, so a failed write never leaves a truncated
+        # preferences file behind. The write stays synchronous because the caller reports the result
+        tmp_path = 'preferences/style_preferences.json.tmp'
+        with open(tmp_path, 'w') as f:
             json.dump(style_dict, f, indent=4)
+        os.replace(tmp_path, 'preferences/style_preferences.json')
 
+        # New sessions should start from what was just saved
+        _read_preferences.clear()
         return True
     except Exception as e:
         st.sidebar.warning(f"Could not save preferences: {e}")
         return False
 
 
+def _get_chart(chart_class, style, data_processor):
+    """Reuse one chart instance per chart class for the session, rebinding its style and data processor"""
+    key = f"chart_{chart_class.__name__}"
+    if key not in st.session_state:
+        st.session_state[key] = chart_class(style=style, data_processor=data_processor)
+
+    chart = st.session_state[key]
+    chart.style = style
+    chart.data_processor = data_processor
+    return chart
+
+
+def _get_figure(key, build_figure):
+    """Return the figure built for key on an earlier run, only calling build_figure when key changes"""
+    memo = st.session_state.get('figure_memo')
+    if memo is None or memo[0] != key:
+        memo = (key, build_figure())
+        st.session_state.figure_memo = memo
+    return memo[1]
+
+
+def _apply_date_preset(date_col, start_day, end_day):
+    """Set a date column's filter inputs to a preset range"""
+    st.session_state[f"start_{date_col}"] = start_day
+    st.session_state[f"end_{date_col}"] = end_day
+
+
+def _set_overview_metrics(selection):
+    """Set the overview metrics, including the selection widget's own state"""
+    st.session_state.selected_overview_metrics = list(selection)
+    st.session_state.overview_metric_select = list(selection)
+
+
+def _format_card_values(values, value_types):
+    """Format a (card set x metric) array of overview values by metric type, one list of strings per card set"""
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    scale = np.digitize(values, _SCALE_THRESHOLDS)
+    scale[np.isnan(values)] = 0
+
+    # Shortened K/M labels for every cell at once; other formats overwrite their columns below
+    formatted = np.char.add(np.char.mod('%.1f', values / _SCALE_DIVISORS[scale]),
+                            _SCALE_SUFFIXES[scale]).astype(object)
+    for j, value_type in enumerate(value_types):
+        column = values[:, j]
+        if value_type == 'currency':
+            formatted[:, j] = list(map(_FORMAT_CURRENCY, column))
+        elif value_type == 'percentage':
+            formatted[:, j] = list(map(_FORMAT_PERCENTAGE, column))
+        else:
+            unscaled = scale[:, j] == 0
+            formatted[unscaled, j] = list(map(_FORMAT_NUMBER, column[unscaled]))
+
+    return formatted.tolist()
+
+
+def _metric_cards_html(cards, color, padding=15, radius=8, title_tag='h5', title_size=12,
+                       value_tag='h2', value_size=28):
+    """Build (label, formatted value) cards as the HTML of a grid of up to 4 columns"""
+    card_html = "".join(
+        f'<div style="background-color: #111111; padding: {padding}px; border-radius: {radius}px; '
+        f'border-left: 4px solid {color}; margin-bottom: 10px;">'
+        f'<{title_tag} style="color: #ffffff; margin: 0; font-size: {title_size}px;">{label}</{title_tag}>'
+        f'<{value_tag} style="color: {color}; margin: 5px 0 0 0; font-size: {value_size}px; font-weight: bold;">'
+        f'{value}</{value_tag}></div>'
+        for label, value in cards
+    )
+    return (f'<div style="display: grid; grid-template-columns: repeat({min(4, len(cards))}, 1fr); gap: 0 1rem;">'
+            f'{card_html}</div>')
+
+
+def _render_metric_cards(cards, color, **card_style):
+    """Render metric cards in a single markdown call"""
+    st.markdown(_metric_cards_html(cards, color, **card_style), unsafe_allow_html=True)
+
+
+def _render_html_tabs(panels):
+    """Show (tab label, body HTML) panels as CSS-only tabs in one HTML element, with the first tab selected"""
+    # The tabs are rendered into the page itself, so the ids and styles are prefixed to stay clear of the app's
+    rules = "".join(
+        f'#overview-tab-{i}:checked ~ #overview-panel-{i} {{ display: block; }}'
+        f'#overview-tab-{i}:checked ~ label[for="overview-tab-{i}"] {{ color: #fe2c56; border-bottom-color: #fe2c56; }}'
+        for i in range(len(panels))
+    )
+    # Inputs come first so the :checked rules can reach the labels and panels after them
+    inputs = "".join(f'<input type="radio" name="overview-tabs" id="overview-tab-{i}"{" checked" if i == 0 else ""}>'
+                     for i in range(len(panels)))
+    labels = "".join(f'<label for="overview-tab-{i}">{escape(label)}</label>' for i, (label, _) in enumerate(panels))
+    bodies = "".join(f'<div class="panel" id="overview-panel-{i}">{body}</div>' for i, (_, body) in enumerate(panels))
+
+    st.html(f'<style>{_TABS_CSS}{rules}</style><div class="overview-tabs">{inputs}{labels}{bodies}</div>')
+
+
+def _dump_report(report_data, raw_data_sample):
+    """Serialize the report with the JSON data sample from pandas parsed in as its last key"""
+    return json.dumps({**report_data, "raw_data_sample": json.loads(raw_data_sample)}, indent=2, default=str)
+
+
+@st.fragment
+def _save_chart_button(fig, filename):
+    """Save Chart button; as a fragment, clicking it reruns only this block instead of the whole page"""
+    if st.button("Save Chart"):
+        # Save the figure drawn above, if the current settings produced one
+        if fig is None:
+            st.warning("No valid chart to save")
+            return
+
+        # Create charts directory if it doesn't exist
+        os.makedirs('charts', exist_ok=True)
+
+        # Save the figure as HTML
+        try:
+            # Load plotly.js from the CDN instead of embedding ~3MB of it in every file
+            fig.write_html(filename, include_plotlyjs='cdn', include_mathjax=False,
+                           config={'displayModeBar': True})
+            st.success(f"Chart saved as {filename}")
+        except Exception as e:
+            st.error(f"Error saving chart: {e}")
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _load_cached(_file_bytes, name, content_key):
+    """Parse an uploaded file once per distinct content and name, keeping the last few files"""
+    # The leading underscore keeps Streamlit from hashing the raw bytes; content_key stands in for them
+    data_processor = DataProcessor()
+    data_processor.load_from_bytes(_file_bytes, name, engine='pyarrow', content_key=content_key)
+    return data_processor
+
+
 def main():
     st.title("🎵 GG Data Visualiser")
 
-    st.markdown("""
-    <style>
-    .stApp {
-        background-color: #000000 !important;
-        color: #ffffff !important;
-    }
-    .stSidebar {
-        background-color: #111111 !important;
-    }
-    .stSelectbox label, .stMultiSelect label, .stFileUploader label {
-        color: #ffffff !important;
-    }
-    .stMarkdown {
-        color: #ffffff !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_GLOBAL_CSS, unsafe_allow_html=True)
 
     # Initialize session state variables if they don't exist
     if 'style' not in st.session_state:
@@ -78,31 +256,28 @@ def main():
         else:
             st.session_state.style = TikTokStyle()
 
-    # Add a session state for the success message
-    if 'show_success' not in st.session_state:
-        st.session_state.show_success = False
-
     style = st.session_state.style
 
     uploaded_file = st.file_uploader("Upload TikTok Ad Report", type=["xlsx", "csv"])
 
     if uploaded_file is not None:
-        data_processor = DataProcessor()
-        with st.spinner("Loading and processing data..."):
-            try:
-                data = data_processor.load_data(uploaded_file)
-                st.session_state.show_success = True
-                # Use empty to create a container for the success message
-                success_container = st.empty()
-                if st.session_state.show_success:
-                    success_container.success("File loaded successfully!")
-                    # Schedule the message to disappear after 3 seconds
-                    time.sleep(3)
-                    success_container.empty()
-                    st.session_state.show_success = False
-            except Exception as e:
-                st.error(f"Error loading file: {e}")
-                return
+        # Only parse when a new file is uploaded; other reruns reuse the processor in session state
+        if st.session_state.get('data_file_id') != uploaded_file.file_id:
+            with st.spinner("Loading and processing data..."):
+                try:
+                    file_bytes = uploaded_file.getvalue()
+                    content_key = hashlib.sha256(file_bytes).hexdigest()
+                    st.session_state.data_processor = _load_cached(file_bytes, uploaded_file.name, content_key)
+                    st.session_state.data_file_id = uploaded_file.file_id
+                except Exception as e:
+                    st.error(f"Error loading file: {e}")
+                    return
+
+            # The toast dismisses itself in the browser, so no rerun or wait is needed to hide it
+            st.toast("File loaded successfully!", icon="✅")
+
+        data_processor = st.session_state.data_processor
+        data = data_processor.data
 
         metrics = data_processor.get_metrics()
         dimensions = data_processor.get_dimensions()
@@ -125,43 +300,9 @@ def main():
                     st.write("**Sample values from selected column:**")
                     st.write(data_processor.data[selected_date_col].head().tolist())
 
-                    # Try multiple date formats for better conversion
-                    date_formats = [
-                        '%Y-%m-%d',  # 2024-01-01
-                        '%Y-%m',  # 2025-01 (month only)
-                        '%d/%m/%Y',  # 01/01/2024
-                        '%m/%d/%Y',  # 01/01/2024
-                        '%d-%m-%Y',  # 01-01-2024
-                        '%Y/%m',  # 2025/01 (month only)
-                        '%Y-%m-%d %H:%M:%S',  # With time
-                        None  # Let pandas infer
-                    ]
-
-                    converted = False
-                    for fmt in date_formats:
-                        try:
-                            if fmt:
-                                data_processor.data[selected_date_col] = pd.to_datetime(
-                                    data_processor.data[selected_date_col],
-                                    format=fmt,
-                                    errors='coerce'
-                                )
-                            else:
-                                data_processor.data[selected_date_col] = pd.to_datetime(
-                                    data_processor.data[selected_date_col],
-                                    errors='coerce',
-                                    infer_datetime_format=True
-                                )
-
-                            # Check if conversion worked
-                            if data_processor.data[selected_date_col].notna().sum() > 0:
-                                converted = True
-                                break
-                        except:
-                            continue
+                    converted = data_processor.convert_date_column(selected_date_col)
 
                     if converted:
-                        data_processor.date_columns.append(selected_date_col)
                         date_columns = data_processor.get_date_columns()
                         st.success(f"✅ Converted '{selected_date_col}' to date column!")
                         st.rerun()
@@ -190,61 +331,54 @@ def main():
         # Date range filters
         date_range_filters = {}
 
+        # Min/max of every date column, looked up once per run and shared by the filters and the report
+        date_ranges = {date_col: data_processor.get_date_range(date_col) for date_col in date_columns}
+
         # Show date range filters if date columns exist
         if date_columns:
             for date_col in date_columns:
                 with date_filter_container.expander(f"Filter by {date_col}", expanded=True):
-                    min_date, max_date = data_processor.get_date_range(date_col)
+                    min_date, max_date = date_ranges[date_col]
                     if min_date and max_date:
                         # Create a date range slider
                         use_date_filter = st.checkbox(f"Apply filter for {date_col}", key=f"use_{date_col}")
 
                         if use_date_filter:
-                            # Get the timestamp versions
-                            max_date_ts = pd.Timestamp(max_date)
-                            min_date_ts = pd.Timestamp(min_date)
+                            # Calendar-day bounds used by the inputs and the presets below
+                            min_day = min_date.date()
+                            max_day = max_date.date()
+
+                            # The inputs read their values from session state, which the preset buttons below
+                            # write. Missing or out-of-range values (e.g. from another file) reset to the bounds
+                            for key, default in ((f"start_{date_col}", min_day), (f"end_{date_col}", max_day)):
+                                value = st.session_state.get(key)
+                                if value is None or not min_day <= value <= max_day:
+                                    st.session_state[key] = default
 
                             # Show date inputs
                             col1, col2 = st.columns(2)
                             with col1:
                                 start_date = st.date_input(
                                     f"Start {date_col}",
-                                    min_date_ts.date() if hasattr(min_date_ts, 'date') else min_date,
-                                    min_value=min_date_ts.date() if hasattr(min_date_ts, 'date') else min_date,
-                                    max_value=max_date_ts.date() if hasattr(max_date_ts, 'date') else max_date,
+                                    min_value=min_day,
+                                    max_value=max_day,
                                     key=f"start_{date_col}"
                                 )
                             with col2:
                                 end_date = st.date_input(
                                     f"End {date_col}",
-                                    max_date_ts.date() if hasattr(max_date_ts, 'date') else max_date,
-                                    min_value=min_date_ts.date() if hasattr(min_date_ts, 'date') else min_date,
-                                    max_value=max_date_ts.date() if hasattr(max_date_ts, 'date') else max_date,
+                                    min_value=min_day,
+                                    max_value=max_day,
                                     key=f"end_{date_col}"
                                 )
 
-                            # Add preset buttons for common date ranges
+                            # Add preset buttons for common date ranges. Their callbacks set the inputs
+                            # before the rerun, so a click shows up in the inputs and the filter at once
                             preset_cols = st.columns(4)
-
-                            with preset_cols[0]:
-                                if st.button("Last 7d", key=f"7d_{date_col}"):
-                                    start_date = (max_date_ts - pd.Timedelta(days=7)).date()
-                                    end_date = max_date_ts.date()
-
-                            with preset_cols[1]:
-                                if st.button("Last 30d", key=f"30d_{date_col}"):
-                                    start_date = (max_date_ts - pd.Timedelta(days=30)).date()
-                                    end_date = max_date_ts.date()
-
-                            with preset_cols[2]:
-                                if st.button("Last 90d", key=f"90d_{date_col}"):
-                                    start_date = (max_date_ts - pd.Timedelta(days=90)).date()
-                                    end_date = max_date_ts.date()
-
-                            with preset_cols[3]:
-                                if st.button("All", key=f"all_{date_col}"):
-                                    start_date = min_date_ts.date() if hasattr(min_date_ts, 'date') else min_date
-                                    end_date = max_date_ts.date() if hasattr(max_date_ts, 'date') else max_date
+                            for preset_col, (label, key_prefix, days) in zip(preset_cols, _DATE_PRESETS):
+                                preset_start = max(min_day, max_day - timedelta(days=days)) if days else min_day
+                                preset_col.button(label, key=f"{key_prefix}_{date_col}", on_click=_apply_date_preset,
+                                                  args=(date_col, preset_start, max_day))
 
                             # Convert date objects to pandas timestamps for filtering
                             start_ts = pd.Timestamp(start_date)
@@ -258,8 +392,9 @@ def main():
         # ----- 2. DIMENSION FILTERS SECOND -----
         dimension_filter_container.subheader("Dimension Filters")
 
-        # Regular dimension filters
-        non_date_dimensions = [col for col in dimensions if col not in date_columns]
+        # Regular dimension filters; the non-date dimensions are also the chart axis and group options
+        date_column_set = set(date_columns)
+        non_date_dimensions = [col for col in dimensions if col not in date_column_set]
         filter_cols = dimension_filter_container.multiselect("Select Dimensions to Filter By", non_date_dimensions)
         filters = {}
 
@@ -310,32 +445,40 @@ def main():
 
                     # Randomize colors button
                     if st.button("🎲 Randomize Colors", key="randomize_multiline_colors"):
-                        import random
                         tiktok_palette = style.bar_colors.copy()
-                        new_colors = random.sample(tiktok_palette, min(8, len(tiktok_palette)))
+                        rng = np.random.default_rng()
+                        color_idx = rng.choice(len(tiktok_palette), size=min(8, len(tiktok_palette)), replace=False)
+                        new_colors = [tiktok_palette[i] for i in color_idx]
 
-                        # Update session state
+                        # Update session state, dropping table edits so the new colors show
+                        st.session_state.pop("multiline_colors_editor", None)
                         st.session_state.custom_line_colors = new_colors
-                        st.session_state.secondary_axis_color = random.choice(tiktok_palette)
+                        st.session_state.secondary_axis_color = tiktok_palette[rng.integers(len(tiktok_palette))]
                         style.color_sequence = new_colors
                         style.line_color = new_colors[0]
                         st.success("🎨 Colors randomized!")
 
-                    # Show color pickers for first 8 colors
-                    for i in range(8):
-                        default_color = style.color_sequence[i] if i < len(style.color_sequence) else "#fe2c56"
-
-                        color = st.color_picker(
-                            f"Line {i + 1} Color",
-                            st.session_state.custom_line_colors[i] if i < len(
-                                st.session_state.custom_line_colors) else default_color,
-                            key=f"multiline_color_{i}"
-                        )
+                    # Edit all 8 line colors in one table instead of eight separate color pickers
+                    line_colors = [
+                        st.session_state.custom_line_colors[i] if i < len(st.session_state.custom_line_colors)
+                        else style.color_sequence[i] if i < len(style.color_sequence) else "#fe2c56"
+                        for i in range(8)
+                    ]
+                    edited_colors = st.data_editor(
+                        pd.DataFrame({'Line': [f"Line {i + 1}" for i in range(8)], 'Color': line_colors}),
+                        column_config={
+                            'Line': st.column_config.TextColumn(disabled=True),
+                            'Color': st.column_config.TextColumn("Color (hex)", validate=_HEX_COLOR_PATTERN)
+                        },
+                        hide_index=True,
+                        key="multiline_colors_editor"
+                    )
 
-                        if len(st.session_state.custom_line_colors) <= i:
-                            st.session_state.custom_line_colors.append(color)
-                        else:
-                            st.session_state.custom_line_colors[i] = color
+                    # Keep the previous color for any entry that isn't a valid hex color
+                    st.session_state.custom_line_colors = [
+                        color if isinstance(color, str) and re.fullmatch(_HEX_COLOR_PATTERN, color) else line_colors[i]
+                        for i, color in enumerate(edited_colors['Color'])
+                    ]
 
                     # Secondary axis color picker
                     st.markdown("**Secondary Y-Axis Color:**")
@@ -376,17 +519,13 @@ def main():
 
             elif chart_type == "Bar Chart":
                 with style_container.expander("Bar Chart Style", expanded=True):
-                    # Custom bar colors with multiselect
+                    # Custom bar colors, one picker per bar color (up to 5) side by side in one row
                     st.text("Bar Colors")
-                    colors = ["#00f2ea", "#ff0050", "#ccff00", "#ee1d52", "#69c9d0", "#ffffff", "#000000", "#ff0000",
-                              "#00ff00", "#0000ff"]
-                    selected_colors = []
-
-                    # Display color pickers for each bar color (up to 5)
-                    for i in range(min(5, len(style.bar_colors))):
-                        color_key = f"bar_color_{i}"
-                        selected_colors.append(st.color_picker(f"Color {i + 1}", style.bar_colors[i] if i < len(
-                            style.bar_colors) else "#ffffff"))
+                    color_cols = st.columns(5)
+                    selected_colors = [
+                        color_col.color_picker(f"Color {i + 1}", color, label_visibility="collapsed")
+                        for i, (color_col, color) in enumerate(zip(color_cols, style.bar_colors[:5]))
+                    ]
 
                     style.bar_colors = selected_colors
                     style.color_sequence = selected_colors  # Use same colors for color sequence
@@ -415,55 +554,63 @@ def main():
             if 'metric_overrides' not in st.session_state:
                 st.session_state.metric_overrides = {}
 
-            for metric in metrics:
-                col1, col2, col3 = st.columns([2, 1, 1])
+            # Selections only take effect (and rerun the app) when Apply is pressed
+            with st.form("metric_overrides_form"):
+                new_overrides = {}
+                for metric in metrics:
+                    col1, col2, col3 = st.columns([2, 1, 1])
 
-                with col1:
-                    # Get current setting (either overridden or auto-detected)
-                    if metric in st.session_state.metric_overrides:
-                        current_agg = st.session_state.metric_overrides[metric]['agg']
-                    else:
-                        current_agg = data_processor.get_aggregation_type(metric)
+                    with col1:
+                        # Get current setting (either overridden or auto-detected)
+                        if metric in st.session_state.metric_overrides:
+                            current_agg = st.session_state.metric_overrides[metric]['agg']
+                        else:
+                            current_agg = data_processor.get_aggregation_type(metric)
 
-                    new_agg = st.selectbox(
-                        f"{metric} - Aggregation",
-                        options=["sum", "average"],
-                        index=1 if current_agg == "average" else 0,
-                        key=f"agg_{metric}"
-                    )
+                        new_agg = st.selectbox(
+                            f"{metric} - Aggregation",
+                            options=["sum", "average"],
+                            index=1 if current_agg == "average" else 0,
+                            key=f"agg_{metric}"
+                        )
 
-                with col2:
-                    # Get current type (either overridden or auto-detected)
-                    if metric in st.session_state.metric_overrides:
-                        current_type = st.session_state.metric_overrides[metric]['type']
-                    else:
-                        current_type = data_processor.get_metric_type(metric)
+                    with col2:
+                        # Get current type (either overridden or auto-detected)
+                        if metric in st.session_state.metric_overrides:
+                            current_type = st.session_state.metric_overrides[metric]['type']
+                        else:
+                            current_type = data_processor.get_metric_type(metric)
 
-                    new_type = st.selectbox(
-                        "Format Type",
-                        options=["number", "currency", "percentage"],
-                        index=["number", "currency", "percentage"].index(current_type),
-                        key=f"type_{metric}"
-                    )
+                        new_type = st.selectbox(
+                            "Format Type",
+                            options=["number", "currency", "percentage"],
+                            index=["number", "currency", "percentage"].index(current_type),
+                            key=f"type_{metric}"
+                        )
 
-                with col3:
-                    decimal_places = st.selectbox(
-                        "Decimals",
-                        options=[0, 1, 2, 3],
-                        index=2,
-                        key=f"decimals_{metric}"
-                    )
+                    with col3:
+                        decimal_places = st.selectbox(
+                            "Decimals",
+                            options=[0, 1, 2, 3],
+                            index=2,
+                            key=f"decimals_{metric}"
+                        )
 
-                # Apply overrides to data processor
-                data_processor.aggregation_types[metric] = new_agg
-                data_processor.metric_types[metric] = new_type
+                    new_overrides[metric] = {
+                        'agg': new_agg,
+                        'type': new_type,
+                        'decimals': decimal_places
+                    }
 
                 # Store in session state
-                st.session_state.metric_overrides[metric] = {
-                    'agg': new_agg,
-                    'type': new_type,
-                    'decimals': decimal_places
-                }
+                if st.form_submit_button("Apply"):
+                    st.session_state.metric_overrides.update(new_overrides)
+
+        # Apply overrides to data processor
+        for metric, override in st.session_state.metric_overrides.items():
+            if metric in data_processor.aggregation_types:
+                data_processor.aggregation_types[metric] = override['agg']
+                data_processor.metric_types[metric] = override['type']
 
         # Show applied filters
         if filters or date_range_filters:
@@ -480,8 +627,23 @@ def main():
                         if values:
                             st.write(f"**{col}**: {', '.join(str(v) for v in values)}")
 
-        # Identify date columns explicitly
-        non_date_dimensions = [col for col in dimensions if col not in date_columns]
+        # Only some chart types set these; the overview, save and report sections read them
+        fig = None
+        x_axis = None
+        y_axis = None
+        group_by = None
+        secondary_y_axis = None
+
+        # Everything outside the chart's own settings that its figure depends on
+        figure_inputs = (
+            st.session_state.data_file_id,
+            repr(sorted(filters.items())),
+            repr(sorted(date_range_filters.items())),
+            tuple(date_columns),
+            repr(sorted(vars(style).items())),
+            repr(sorted(data_processor.metric_types.items())),
+            repr(sorted(data_processor.aggregation_types.items()))
+        )
 
         if chart_type == "Line Chart":
             st.subheader("Line Chart Settings")
@@ -516,8 +678,12 @@ def main():
                 group_by = None
 
             # Create line chart with data processor for currency/percentage formatting
-            line_chart = LineChart(style=style, data_processor=data_processor)
-            fig = line_chart.create_chart(filtered_data, x_axis, y_axis, group_by, secondary_y_axis=secondary_y_axis)
+            from line_chart import LineChart
+            line_chart = _get_chart(LineChart, style, data_processor)
+            fig = _get_figure(
+                (chart_type, x_axis, y_axis, group_by, secondary_y_axis, figure_inputs),
+                lambda: line_chart.create_chart(filtered_data, x_axis, y_axis, group_by, secondary_y_axis=secondary_y_axis)
+            )
 
             # Apply chart width
             fig.update_layout(width=chart_width)
@@ -536,12 +702,16 @@ def main():
 
             if y_metrics:
                 # Create bar chart with data processor for currency/percentage formatting
-                bar_chart = BarChart(style=style, data_processor=data_processor)
-                fig = bar_chart.create_chart(
-                    filtered_data,
-                    x_axis,
-                    y_metrics,
-                    orientation="v" if orientation == "Vertical" else "h"
+                from bar_chart import BarChart
+                bar_chart = _get_chart(BarChart, style, data_processor)
+                fig = _get_figure(
+                    (chart_type, x_axis, tuple(y_metrics), orientation, figure_inputs),
+                    lambda: bar_chart.create_chart(
+                        filtered_data,
+                        x_axis,
+                        y_metrics,
+                        orientation="v" if orientation == "Vertical" else "h"
+                    )
                 )
                 # Apply chart width
                 fig.update_layout(width=chart_width)
@@ -570,45 +740,29 @@ def main():
 
             if x_axis != y_axis:
                 # Create heatmap with data processor for currency/percentage formatting
-                heatmap = HeatMap(style=style, data_processor=data_processor)
-                fig = heatmap.create_chart(filtered_data, x_axis, y_axis, metric)
+                from heatmap import HeatMap
+                heatmap = _get_chart(HeatMap, style, data_processor)
+                fig = _get_figure(
+                    (chart_type, x_axis, y_axis, metric, figure_inputs),
+                    lambda: heatmap.create_chart(filtered_data, x_axis, y_axis, metric)
+                )
                 # Apply chart width
                 fig.update_layout(width=chart_width)
                 st.plotly_chart(fig, use_container_width=False, config={'displayModeBar': True})
             else:
                 st.warning("Please select different dimensions for X and Y axes.")
 
-        # Add save chart button
-        if st.button("Save Chart"):
-            # Get the figure from the appropriate chart type
-            if chart_type == "Line Chart":
-                fig = line_chart.fig
-            elif chart_type == "Bar Chart" and y_metrics:
-                fig = bar_chart.fig
-            elif chart_type == "Heat Map" and x_axis != y_axis:
-                fig = heatmap.fig
-            else:
-                st.warning("No valid chart to save")
-                return
-
-            # Create charts directory if it doesn't exist
-            os.makedirs('charts', exist_ok=True)
-
-            # Generate filename based on chart type and metrics
-            if chart_type == "Line Chart" and secondary_y_axis:
-                filename = f"charts/tiktok_{chart_type.lower().replace(' ', '_')}_{x_axis}_{y_axis}_vs_{secondary_y_axis}.html"
-            elif chart_type == "Bar Chart":
-                metrics_str = "_".join(y_metrics)
-                filename = f"charts/tiktok_{chart_type.lower().replace(' ', '_')}_{x_axis}_{metrics_str}.html"
-            else:
-                filename = f"charts/tiktok_{chart_type.lower().replace(' ', '_')}_{x_axis}_{y_axis if 'y_axis' in locals() else metric}.html"
+        # Generate filename based on chart type and metrics
+        if chart_type == "Line Chart" and secondary_y_axis:
+            filename = f"charts/tiktok_{chart_type.lower().replace(' ', '_')}_{x_axis}_{y_axis}_vs_{secondary_y_axis}.html"
+        elif chart_type == "Bar Chart":
+            metrics_str = "_".join(y_metrics)
+            filename = f"charts/tiktok_{chart_type.lower().replace(' ', '_')}_{x_axis}_{metrics_str}.html"
+        else:
+            filename = f"charts/tiktok_{chart_type.lower().replace(' ', '_')}_{x_axis}_{y_axis}.html"
 
-            # Save the figure as HTML
-            try:
-                fig.write_html(filename)
-                st.success(f"Chart saved as {filename}")
-            except Exception as e:
-                st.error(f"Error saving chart: {e}")
+        # Add save chart button
+        _save_chart_button(fig, filename)
 
         # MOVED Data Preview to after the charts
 
@@ -637,178 +791,93 @@ def main():
             if 'selected_overview_metrics' not in st.session_state:
                 st.session_state.selected_overview_metrics = metrics.copy()
 
-            # Create removable metric tags
-            metric_cols = st.columns(4)
-            for i, metric in enumerate(metrics):
-                with metric_cols[i % 4]:
-                    is_selected = metric in st.session_state.selected_overview_metrics
-
-                    if st.checkbox(
-                            metric.replace('_', ' ').title(),
-                            value=is_selected,
-                            key=f"overview_metric_{metric}"
-                    ):
-                        if metric not in st.session_state.selected_overview_metrics:
-                            st.session_state.selected_overview_metrics.append(metric)
-                    else:
-                        if metric in st.session_state.selected_overview_metrics:
-                            st.session_state.selected_overview_metrics.remove(metric)
+            # One multiselect for all metrics instead of a checkbox per metric
+            if 'overview_metric_select' not in st.session_state:
+                st.session_state.overview_metric_select = [
+                    m for m in st.session_state.selected_overview_metrics if m in metrics
+                ]
+            st.session_state.selected_overview_metrics = st.multiselect(
+                "Metrics to show",
+                metrics,
+                format_func=lambda m: m.replace('_', ' ').title(),
+                key="overview_metric_select"
+            )
 
-            # Quick action buttons
+            # Quick action buttons; their callbacks update the selection before the next run draws it
             button_cols = st.columns(3)
             with button_cols[0]:
-                if st.button("Select All", key="select_all_metrics"):
-                    st.session_state.selected_overview_metrics = metrics.copy()
-                    st.rerun()
+                st.button("Select All", key="select_all_metrics",
+                          on_click=_set_overview_metrics, args=(metrics,))
             with button_cols[1]:
-                if st.button("Select None", key="select_no_metrics"):
-                    st.session_state.selected_overview_metrics = []
-                    st.rerun()
+                st.button("Select None", key="select_no_metrics",
+                          on_click=_set_overview_metrics, args=([],))
             with button_cols[2]:
-                if st.button("Reset to Default", key="reset_metrics"):
-                    st.session_state.selected_overview_metrics = metrics.copy()
-                    st.rerun()
+                st.button("Reset to Default", key="reset_metrics",
+                          on_click=_set_overview_metrics, args=(metrics,))
 
         # Get selected metrics for display
         display_metrics = st.session_state.get('selected_overview_metrics', metrics)
 
+        # Metric metadata looked up once for the overview, comparison and report below
+        agg_types = {metric: data_processor.get_aggregation_type(metric) for metric in metrics}
+        metric_types = {metric: data_processor.get_metric_type(metric) for metric in metrics}
+
+        # The pandas reducer for each metric; the processor labels averaged metrics 'average'
+        agg_mode = {metric: 'mean' if agg_type == 'average' else 'sum' for metric, agg_type in agg_types.items()}
+
         if not display_metrics:
             st.info("🔍 No metrics selected for overview. Click 'Configure Metrics' to select some.")
         else:
+            # How each metric is aggregated, shared by the totals and the group aggregate
+            agg_map = tuple((metric, agg_mode[metric]) for metric in display_metrics)
+
             # Calculate overview metrics
             if group_by and group_by in filtered_data.columns:
                 # GROUPED OVERVIEW WITH TOTAL TAB
                 st.markdown(f"**Metrics by {group_by}:**")
 
-                # Get unique groups
-                groups = filtered_data[group_by].unique()
+                # Aggregate all groups at once; the tabs below look their row up instead of re-filtering
+                group_frame = data_processor.aggregate_groups(filtered_data, group_by, agg_map)
 
-                # Create tabs including Total tab
-                tab_names = ["📋 Total"] + [str(group) for group in groups]
-                tabs = st.tabs(tab_names)
+                # Groups in order of first appearance, as unique() returns them
+                groups = group_frame.index
 
-                # Store all group metrics for comparison
-                comparison_data = []
+                # Every tab's cards are built as HTML and shown in one component, including the Total tab.
+                # The totals and every group's metrics are formatted together in one batch
+                total_metrics = filtered_data.agg(dict(agg_map))
+                card_text = _format_card_values(
+                    np.vstack([total_metrics.to_numpy(dtype=float), group_frame.to_numpy(dtype=float)]),
+                    [metric_types[metric] for metric in display_metrics]
+                )
+                card_labels = [metric.replace('_', ' ').title() for metric in display_metrics]
 
-                # TOTAL TAB
-                with tabs[0]:
-                    st.markdown("**Overall Totals Across All Groups:**")
+                # TOTAL TAB, using TikTok pink
+                panels = [("📋 Total", "<p><strong>Overall Totals Across All Groups:</strong></p>"
+                           + _metric_cards_html(list(zip(card_labels, card_text[0])), "#fe2c56"))]
 
-                    # Calculate total metrics
-                    total_metrics = {}
-                    for metric in display_metrics:
-                        agg_type = data_processor.get_aggregation_type(metric)
-                        if agg_type == 'average':
-                            total_metrics[metric] = filtered_data[metric].mean()
-                        else:
-                            total_metrics[metric] = filtered_data[metric].sum()
+                # GROUP TABS
+                for i, group_value in enumerate(groups):
+                    # Display metrics in cards with group colors
+                    group_color = st.session_state.custom_line_colors[i % len(
+                        st.session_state.custom_line_colors)] if 'custom_line_colors' in st.session_state else \
+                    style.color_sequence[i % len(style.color_sequence)]
 
-                    # Display total metrics
-                    cols = st.columns(min(4, len(total_metrics)))
+                    panels.append((str(group_value),
+                                   _metric_cards_html(list(zip(card_labels, card_text[i + 1])), group_color,
+                                                      value_size=24)))
 
-                    for j, (metric, value) in enumerate(total_metrics.items()):
-                        with cols[j % 4]:
-                            # Format based on metric type
-                            metric_type = data_processor.get_metric_type(metric)
-
-                            if metric_type == 'currency':
-                                formatted_value = f"£{value:,.2f}"
-                            elif metric_type == 'percentage':
-                                formatted_value = f"{value:.2f}%"
-                            else:
-                                if value >= 1000000:
-                                    formatted_value = f"{value / 1000000:.1f}M"
-                                elif value >= 1000:
-                                    formatted_value = f"{value / 1000:.1f}K"
-                                else:
-                                    formatted_value = f"{value:,.0f}"
-
-                            # Use TikTok pink for total
-                            st.markdown(f"""
-                            <div style="
-                                background-color: #111111; 
-                                padding: 15px; 
-                                border-radius: 8px; 
-                                border-left: 4px solid #fe2c56;
-                                margin-bottom: 10px;
-                            ">
-                                <h5 style="color: #ffffff; margin: 0; font-size: 12px;">
-                                    {metric.replace('_', ' ').title()}
-                                </h5>
-                                <h2 style="color: #fe2c56; margin: 5px 0 0 0; font-size: 28px; font-weight: bold;">
-                                    {formatted_value}
-                                </h2>
-                            </div>
-                            """, unsafe_allow_html=True)
-
-                # GROUP TABS
-                for i, (tab, group_value) in enumerate(zip(tabs[1:], groups)):
-                    with tab:
-                        # Filter data for this group
-                        group_data = filtered_data[filtered_data[group_by] == group_value]
-
-                        # Calculate metrics for this group
-                        group_metrics = {}
-                        for metric in display_metrics:
-                            agg_type = data_processor.get_aggregation_type(metric)
-                            if agg_type == 'average':
-                                group_metrics[metric] = group_data[metric].mean()
-                            else:
-                                group_metrics[metric] = group_data[metric].sum()
-
-                        # Store for comparison
-                        comparison_data.append({group_by: group_value, **group_metrics})
-
-                        # Display metrics in cards with group colors
-                        cols = st.columns(min(4, len(group_metrics)))
-                        group_color = st.session_state.custom_line_colors[i % len(
-                            st.session_state.custom_line_colors)] if 'custom_line_colors' in st.session_state else \
-                        style.color_sequence[i % len(style.color_sequence)]
-
-                        for j, (metric, value) in enumerate(group_metrics.items()):
-                            with cols[j % 4]:
-                                # Format based on metric type
-                                metric_type = data_processor.get_metric_type(metric)
-
-                                if metric_type == 'currency':
-                                    formatted_value = f"£{value:,.2f}"
-                                elif metric_type == 'percentage':
-                                    formatted_value = f"{value:.2f}%"
-                                else:
-                                    if value >= 1000000:
-                                        formatted_value = f"{value / 1000000:.1f}M"
-                                    elif value >= 1000:
-                                        formatted_value = f"{value / 1000:.1f}K"
-                                    else:
-                                        formatted_value = f"{value:,.0f}"
-
-                                # Custom styling with group color
-                                st.markdown(f"""
-                                <div style="
-                                    background-color: #111111; 
-                                    padding: 15px; 
-                                    border-radius: 8px; 
-                                    border-left: 4px solid {group_color};
-                                    margin-bottom: 10px;
-                                ">
-                                    <h5 style="color: #ffffff; margin: 0; font-size: 12px;">
-                                        {metric.replace('_', ' ').title()}
-                                    </h5>
-                                    <h2 style="color: {group_color}; margin: 5px 0 0 0; font-size: 24px; font-weight: bold;">
-                                        {formatted_value}
-                                    </h2>
-                                </div>
-                                """, unsafe_allow_html=True)
+                _render_html_tabs(panels)
 
                 # Comparison table (after tabs)
                 # Comparison table (after tabs) WITH FLIP OPTION
-                if comparison_data and len(comparison_data) > 1:
+                if len(group_frame) > 1:
                     st.markdown("### 📋 Comparison Table")
 
                     # Add flip comparison option
                     col1, col2 = st.columns([3, 1])
                     with col1:
-                        comparison_df = pd.DataFrame(comparison_data)
+                        # The group aggregate is already one row per group
+                        comparison_df = group_frame.reset_index()
                     with col2:
                         if st.button("🔄 Flip Comparison", key="flip_comparison"):
                             if 'comparison_flipped' not in st.session_state:
@@ -819,99 +888,66 @@ def main():
                     formatted_df = comparison_df.copy()
                     for metric in display_metrics:
                         if metric in formatted_df.columns:
-                            metric_type = data_processor.get_metric_type(metric)
+                            # Format whole columns at once; numpy can't group thousands, so those
+                            # formats map the module-level formatters over the array
+                            values = comparison_df[metric].to_numpy(dtype=float)
+                            metric_type = metric_types[metric]
                             if metric_type == 'currency':
-                                formatted_df[metric] = formatted_df[metric].apply(lambda x: f"£{x:,.2f}")
+                                formatted_df[metric] = list(map(_FORMAT_CURRENCY, values))
                             elif metric_type == 'percentage':
-                                formatted_df[metric] = formatted_df[metric].apply(lambda x: f"{x:.2f}%")
+                                formatted_df[metric] = np.char.mod('%.2f%%', values)
                             else:
-                                formatted_df[metric] = formatted_df[metric].apply(
-                                    lambda x: f"{x:,.0f}" if x >= 1 else f"{x:.2f}")
+                                formatted_df[metric] = np.where(values >= 1,
+                                                                list(map(_FORMAT_NUMBER, values)),
+                                                                np.char.mod('%.2f', values))
 
                     st.dataframe(formatted_df, use_container_width=True)
 
                     # Calculate % changes WITH FLIP LOGIC
-                    if len(comparison_data) > 1:
+                    if len(comparison_df) > 1:
                         # Determine base group based on flip state
                         flipped = st.session_state.get('comparison_flipped', False)
 
+                        # Use the last group as base when flipped, otherwise the first
+                        base_position = len(comparison_df) - 1 if flipped else 0
+                        base_row = comparison_df.iloc[base_position]
                         if flipped:
-                            st.markdown(f"### 📈 % Change vs Last Group ({comparison_data[-1][group_by]})")
-                            base_group = comparison_data[-1]  # Use last group as base
-                            compare_groups = comparison_data[:-1]  # Compare all others to last
+                            st.markdown(f"### 📈 % Change vs Last Group ({base_row[group_by]})")
                         else:
-                            st.markdown(f"### 📈 % Change vs First Group ({comparison_data[0][group_by]})")
-                            base_group = comparison_data[0]  # Use first group as base
-                            compare_groups = comparison_data[1:]  # Compare all others to first
-
-                        change_data = []
-                        for group_data in compare_groups:
-                            change_row = {group_by: group_data[group_by]}
-                            for metric in display_metrics:
-                                if metric in base_group and metric in group_data:
-                                    base_value = base_group[metric]
-                                    current_value = group_data[metric]
-                                    if base_value != 0:
-                                        pct_change = ((current_value - base_value) / base_value) * 100
-                                        # Color code the percentage
-                                        if pct_change > 0:
-                                            change_row[metric] = f"🟢 +{pct_change:.1f}%"
-                                        elif pct_change < 0:
-                                            change_row[metric] = f"🔴 {pct_change:.1f}%"
-                                        else:
-                                            change_row[metric] = f"⚪ 0.0%"
-                                    else:
-                                        change_row[metric] = "❓ N/A"
-                            change_data.append(change_row)
-
-                        if change_data:
-                            change_df = pd.DataFrame(change_data)
-                            st.dataframe(change_df, use_container_width=True)
+                            st.markdown(f"### 📈 % Change vs First Group ({base_row[group_by]})")
+
+                        # Compare all other groups to the base in one array operation
+                        compare_df = comparison_df.drop(index=comparison_df.index[base_position])
+                        base_values = base_row[display_metrics].to_numpy(dtype=float)
+                        current_values = compare_df[display_metrics].to_numpy(dtype=float)
+                        with np.errstate(divide='ignore', invalid='ignore'):
+                            pct_change = (current_values - base_values) / base_values * 100
+
+                        # Color code the percentage: classify every cell as up (0), down (1), flat (2)
+                        # or no base (3), then look the label's prefix and fixed text up by class
+                        change_class = np.full(pct_change.shape, 2, dtype=np.uint8)
+                        change_class[pct_change > 0] = 0
+                        change_class[pct_change < 0] = 1
+                        change_class[np.broadcast_to(base_values == 0, pct_change.shape)] = 3
+                        change_text = np.where(change_class < 2, np.char.mod('%.1f%%', pct_change),
+                                               _CHANGE_TEXT[change_class])
+                        change_labels = np.char.add(_CHANGE_PREFIXES[change_class], change_text)
+
+                        change_df = pd.DataFrame(change_labels, columns=display_metrics)
+                        change_df.insert(0, group_by, compare_df[group_by].to_numpy())
+                        st.dataframe(change_df, use_container_width=True)
 
 
             else:
                 # NON-GROUPED OVERVIEW - Nice cards like before
-                overview_metrics = {}
-                for metric in display_metrics:
-                    agg_type = data_processor.get_aggregation_type(metric)
-                    if agg_type == 'average':
-                        overview_metrics[metric] = filtered_data[metric].mean()
-                    else:
-                        overview_metrics[metric] = filtered_data[metric].sum()
-                # Display in columns with nice cards
-                cols = st.columns(min(4, len(overview_metrics)))
-                for i, (metric, value) in enumerate(overview_metrics.items()):
-                    with cols[i % 4]:
-                        # Format based on metric type
-                        metric_type = data_processor.get_metric_type(metric)
-                        if metric_type == 'currency':
-                            formatted_value = f"£{value:,.2f}"
-                        elif metric_type == 'percentage':
-                            formatted_value = f"{value:.2f}%"
-                        else:
-                            if value >= 1000000:
-                                formatted_value = f"{value / 1000000:.1f}M"
-                            elif value >= 1000:
-                                formatted_value = f"{value / 1000:.1f}K"
-                            else:
-                                formatted_value = f"{value:,.0f}"
-                        # Custom styling with TikTok colors (sa as grouped)
-                        st.markdown(f"""
-                            <div style="
-                                background-color: #111111; 
-                                padding: 20px; 
-                                border-radius: 10px; 
-                                border-left: 4px solid #fe2c56;
-                                margin-bottom: 10px;
-                            ">
-                                <h4 style="color: #ffffff; margin: 0; font-size: 14px;">
-                                    {metric.replace('_', ' ').title()}
-                                </h4>
-                                <h1 style="color: #fe2c56; margin: 5px 0 0 0; font-size: 36px; font-weight: bold;">
-                                    {formatted_value}
-                                </h1>
-                            </div>
-                            """, unsafe_allow_html=True)
+                overview_metrics = filtered_data.agg(dict(agg_map))
+                card_text = _format_card_values(overview_metrics.to_numpy(dtype=float),
+                                                [metric_types[metric] for metric in display_metrics])[0]
+                cards = [(metric.replace('_', ' ').title(), text) for metric, text in zip(display_metrics, card_text)]
+
+                # Custom styling with TikTok colors (same as grouped, but larger)
+                _render_metric_cards(cards, "#fe2c56", padding=20, radius=10, title_tag='h4', title_size=14,
+                                     value_tag='h1', value_size=36)
         st.write("Data Preview:")
 
         st.dataframe(filtered_data.head())
@@ -942,10 +978,8 @@ def main():
                         "filtered_rows": len(filtered_data),
                         "date_range": {
                             col: {
-                                "start": data_processor.get_date_range(col)[0].strftime("%Y-%m-%d") if
-                                data_processor.get_date_range(col)[0] else None,
-                                "end": data_processor.get_date_range(col)[1].strftime("%Y-%m-%d") if
-                                data_processor.get_date_range(col)[1] else None
+                                "start": date_ranges[col][0].strftime("%Y-%m-%d") if date_ranges[col][0] else None,
+                                "end": date_ranges[col][1].strftime("%Y-%m-%d") if date_ranges[col][1] else None
                             } for col in date_columns
                         }
                     },
@@ -956,10 +990,10 @@ def main():
                     },
                     "chart_configuration": {
                         "type": chart_type,
-                        "x_axis": locals().get('x_axis', 'Not set'),
-                        "y_axis": locals().get('y_axis', 'Not set'),
-                        "secondary_y_axis": locals().get('secondary_y_axis', None),
-                        "group_by": locals().get('group_by', None),
+                        "x_axis": x_axis or 'Not set',
+                        "y_axis": y_axis or 'Not set',
+                        "secondary_y_axis": secondary_y_axis,
+                        "group_by": group_by,
                         "hide_zero_values": style.hide_zero_values,
                         "show_markers": style.show_markers
                     },
@@ -968,18 +1002,25 @@ def main():
                         "top_performers": {},
                         "data_quality": {}
                     },
-                    "overview_metrics": {},
-                    "raw_data_sample": filtered_data.head(100).to_dict('records') if len(filtered_data) > 0 else []
+                    "overview_metrics": {}
                 }
 
-                # Calculate insights
+                # pandas renders the raw data sample straight to JSON; it is spliced into the report on export
+                raw_data_sample = filtered_data.head(100).to_json(orient='records', date_format='iso')
+
+                # Calculate insights, with every summary statistic computed in one agg over the metric columns
+                metric_frame = filtered_data[display_metrics]
+                stats = metric_frame.agg(['sum', 'mean', 'min', 'max', 'median', 'std', 'count'])
+                null_counts = metric_frame.isnull().sum()
+                zero_counts = (metric_frame == 0).sum()
+
                 for metric in display_metrics:
-                    metric_data = filtered_data[metric].dropna()
-                    if len(metric_data) > 0:
-                        agg_type = data_processor.get_aggregation_type(metric)
-                        metric_type = data_processor.get_metric_type(metric)
+                    value_count = stats.at['count', metric]
+                    if value_count > 0:
+                        agg_type = agg_types[metric]
+                        metric_type = metric_types[metric]
 
-                        total_value = metric_data.sum() if agg_type == 'sum' else metric_data.mean()
+                        total_value = stats.at[agg_mode[metric], metric]
 
                         report_data["overview_metrics"][metric] = {
                             "value": float(total_value),
@@ -989,43 +1030,53 @@ def main():
                         }
 
                         report_data["data_insights"]["metrics_summary"][metric] = {
-                            "min": float(metric_data.min()),
-                            "max": float(metric_data.max()),
-                            "mean": float(metric_data.mean()),
-                            "median": float(metric_data.median()),
-                            "std": float(metric_data.std()) if len(metric_data) > 1 else 0,
-                            "null_count": int(filtered_data[metric].isnull().sum()),
-                            "zero_count": int((filtered_data[metric] == 0).sum())
+                            "min": float(stats.at['min', metric]),
+                            "max": float(stats.at['max', metric]),
+                            "mean": float(stats.at['mean', metric]),
+                            "median": float(stats.at['median', metric]),
+                            "std": float(stats.at['std', metric]) if value_count > 1 else 0,
+                            "null_count": int(null_counts[metric]),
+                            "zero_count": int(zero_counts[metric])
                         }
 
-                # Top performers by group
+                # Top performers by group, from one groupby over the top 3 metrics
                 if group_by and group_by in filtered_data.columns:
-                    for metric in display_metrics[:3]:  # Top 3 metrics only
-                        group_performance = filtered_data.groupby(group_by)[metric].agg(
-                            data_processor.get_aggregation_type(metric) if data_processor.get_aggregation_type(
-                                metric) == 'mean' else 'sum'
-                        ).sort_values(ascending=False)
+                    top_metrics = display_metrics[:3]
+                    group_performance = filtered_data.groupby(group_by, observed=True).agg(
+                        {metric: agg_mode[metric] for metric in top_metrics}
+                    )
+
+                    for metric in top_metrics:
+                        # Groups without a value (e.g. averages of all-NaN rows) can't rank,
+                        # and idxmax/idxmin raise when nothing is left to compare
+                        performance = group_performance[metric].dropna()
+                        if performance.empty:
+                            continue
+
+                        best_group = performance.idxmax()
+                        worst_group = performance.idxmin()
 
                         report_data["data_insights"]["top_performers"][metric] = {
                             "best": {
-                                "group": str(group_performance.index[0]),
-                                "value": float(group_performance.iloc[0])
+                                "group": str(best_group),
+                                "value": float(performance[best_group])
                             },
                             "worst": {
-                                "group": str(group_performance.index[-1]),
-                                "value": float(group_performance.iloc[-1])
+                                "group": str(worst_group),
+                                "value": float(performance[worst_group])
                             }
                         }
 
-                # Data quality insights
+                # Data quality insights, with the missing share of every metric from one pass
+                null_fractions = filtered_data[metrics].isna().mean()
                 report_data["data_insights"]["data_quality"] = {
                     "completeness": {
-                        metric: f"{(1 - filtered_data[metric].isnull().sum() / len(filtered_data)) * 100:.1f}%"
+                        metric: f"{(1 - null_fractions[metric]) * 100:.1f}%"
                         for metric in metrics
                     },
                     "date_coverage": {
-                        col: f"{(data_processor.get_date_range(col)[1] - data_processor.get_date_range(col)[0]).days} days"
-                        for col in date_columns if data_processor.get_date_range(col)[0]
+                        col: f"{(date_ranges[col][1] - date_ranges[col][0]).days} days"
+                        for col in date_columns if date_ranges[col][0]
                     }
                 }
 
@@ -1096,8 +1147,7 @@ Generated: {report_data['timestamp']}
 
                 elif export_format == "JSON Data":
                     # JSON format for programmatic analysis
-                    import json
-                    json_data = json.dumps(report_data, indent=2, default=str)
+                    json_data = _dump_report(report_data, raw_data_sample)
 
                     st.download_button(
                         label="💾 Download JSON Report",
@@ -1108,8 +1158,6 @@ Generated: {report_data['timestamp']}
 
                 elif export_format == "CSV + Summary":
                     # CSV data + summary
-                    csv_data = filtered_data.to_csv(index=False)
-
                     summary = f"""Summary Report - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 File: {report_data['file_info']['filename']}
 Records: {len(filtered_data):,}
@@ -1127,9 +1175,11 @@ Key Metrics:
 
                     zip_buffer = io.BytesIO()
                     with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                        zip_file.writestr("filtered_data.csv", csv_data)
+                        # Write the CSV straight into its zip entry rather than building the whole text first
+                        with zip_file.open("filtered_data.csv", 'w') as csv_file:
+                            filtered_data.to_csv(csv_file, index=False)
                         zip_file.writestr("summary.txt", summary)
-                        zip_file.writestr("full_report.json", json.dumps(report_data, indent=2, default=str))
+                        zip_file.writestr("full_report.json", _dump_report(report_data, raw_data_sample))
 
                     st.download_button(
                         label="💾 Download ZIP Package",
@@ -1145,7 +1195,7 @@ Key Metrics:
                     if export_format == "Detailed Text":
                         st.text(report_text[:2000] + "..." if len(report_text) > 2000 else report_text)
                     elif export_format == "JSON Data":
-                        st.json(report_data)
+                        st.json(json_data)
                     else:
                         st.write("**Package Contents:**")
                         st.write("- filtered_data.csv: Your filtered dataset")
@@ -3,6 +3,14 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 from tiktok_style import TikTokStyle
+from chart_utils import aggregate_metrics, apply_filters
+
+
+def _unused_column_name(name, columns):
+    """Prefix name with underscores until it doesn't clash with any of columns"""
+    while name in columns:
+        name = f"_{name}"
+    return name
 
 
 class BarChart:
@@ -12,123 +20,82 @@ class BarChart:
         self.data_processor = data_processor
 
     def create_chart(self, data, x_axis, metrics, orientation='v', filters=None):
-        if filters:
-            for column, values in filters.items():
-                if column in data.columns and values:
-                    data = data[data[column].isin(values)]
+        data = apply_filters(data, filters)
 
         # Aggregate data using proper methods for each metric
         grouped_data = self._aggregate_data_properly(data, x_axis, metrics)
 
         # Hide zero values if option is enabled
         if self.style.hide_zero_values:
-            # Create a mask to filter out rows with all zeros for selected metrics
-            non_zero_mask = False
-            for metric in metrics:
-                non_zero_mask |= (grouped_data[metric] != 0)
-            grouped_data = grouped_data[non_zero_mask]
-
-        # Check if we need to normalize metrics for better visualization
-        needs_normalization = self._check_scaling_needs(grouped_data, metrics)
-
-        # Create normalized data if needed
-        if needs_normalization:
-            normalized_data = self._normalize_metrics(grouped_data, metrics)
-        else:
-            normalized_data = grouped_data
+            # Filter out rows with all zeros for selected metrics in one pass over the metric block
+            non_zero_mask = (grouped_data[metrics].to_numpy() != 0).any(axis=1)
+            grouped_data = grouped_data.loc[non_zero_mask]
 
-        # Create figure
-        self.fig = go.Figure()
+        # Normalize metrics with very different scales for better visualization
+        normalized_data, needs_normalization = self._scale_and_normalize(grouped_data, metrics)
 
-        # Get metric types and labels
+        # Get metric labels
         metric_labels = {}
-        if self.data_processor:
-            for metric in metrics:
+        for metric in metrics:
+            if self.data_processor:
                 metric_labels[metric] = self.data_processor.get_formatted_label(metric)
-
-        # Add traces for each metric
-        for i, metric in enumerate(metrics):
-            color = self.style.bar_colors[i % len(self.style.bar_colors)]  # Cycle through colors
-
-            # Get the proper label for this metric
-            metric_label = metric_labels.get(metric, metric)
-
-            # If hiding zeros, filter them out for this specific metric
-            metric_data = normalized_data.copy()
-            if self.style.hide_zero_values:
-                # Filter for this specific metric
-                metric_data = metric_data[metric_data[metric] != 0]
-
-            # Get metric type for formatting
+            else:
+                metric_labels[metric] = metric
+
+        # Melt into one long frame (x_axis, metric, value) so all metrics are plotted
+        # from a single frame instead of a filtered copy per metric. The helper columns get
+        # names no user column has, so a metric called e.g. 'value' can't clash with them
+        taken = {x_axis, *metrics}
+        metric_col = _unused_column_name('__metric__', taken)
+        value_col = _unused_column_name('__value__', taken)
+        original_col = _unused_column_name('__original__', taken)
+        long_data = normalized_data.melt(id_vars=x_axis, value_vars=metrics, var_name=metric_col, value_name=value_col)
+
+        # Keep the original (un-normalized) values alongside for the hover text. melt stacks
+        # metric by metric, which is the column-major order of the metric block
+        long_data[original_col] = grouped_data[metrics].to_numpy().ravel(order='F')
+        long_data[metric_col] = long_data[metric_col].map(metric_labels)
+
+        # If hiding zeros, drop them for every metric in one pass
+        if self.style.hide_zero_values:
+            long_data = long_data[long_data[value_col] != 0]
+
+        # Create figure with one trace per metric, cycling through the bar colors
+        self.fig = px.bar(
+            long_data,
+            x=x_axis if orientation == 'v' else value_col,
+            y=value_col if orientation == 'v' else x_axis,
+            color=metric_col,
+            orientation=orientation,
+            barmode='group',
+            custom_data=[original_col],
+            category_orders={metric_col: [metric_labels[metric] for metric in metrics]},
+            color_discrete_map={
+                metric_labels[metric]: self.style.bar_colors[i % len(self.style.bar_colors)]
+                for i, metric in enumerate(metrics)
+            },
+            labels={metric_col: '', value_col: 'value'}
+        )
+
+        # Hover shows the original value formatted by metric type
+        category_axis = 'x' if orientation == 'v' else 'y'
+        for metric in metrics:
             metric_type = 'number'
             if self.data_processor:
                 metric_type = self.data_processor.get_metric_type(metric)
 
-            # Create hover template with original values
-            if needs_normalization:
-                # Use original values for hover
-                custom_hover_text = []
-                for idx, row in metric_data.iterrows():
-                    original_idx = grouped_data[grouped_data[x_axis] == row[x_axis]].index[0]
-                    original_value = grouped_data.loc[original_idx, metric]
-
-                    if metric_type == 'currency':
-                        formatted_value = f"£{original_value:,.2f}"
-                    elif metric_type == 'percentage':
-                        formatted_value = f"{original_value:.2f}%"
-                    else:
-                        formatted_value = f"{original_value:,.0f}"
-
-                    custom_hover_text.append(f"{x_axis}: {row[x_axis]}<br>{metric_label}: {formatted_value}")
-            else:
-                # Standard hover template
-                hover_template = "%{y}"
-                if orientation == 'h':
-                    hover_template = "%{x}"
-
-                if metric_type == 'currency':
-                    hover_template = "£%{y:,.2f}" if orientation == 'v' else "£%{x:,.2f}"
-                elif metric_type == 'percentage':
-                    hover_template = "%{y:.2f}%" if orientation == 'v' else "%{x:.2f}%"
-
-            if orientation == 'v':
-                bar_trace = go.Bar(
-                    x=metric_data[x_axis],
-                    y=metric_data[metric],
-                    name=metric_label,
-                    marker_color=color
-                )
-
-                if needs_normalization:
-                    bar_trace.hovertext = custom_hover_text
-                    bar_trace.hoverinfo = "text"
-                else:
-                    bar_trace.hovertemplate = f"{x_axis}: %{{x}}<br>{metric_label}: {hover_template}<extra></extra>"
-
-                self.fig.add_trace(bar_trace)
-            else:  # horizontal
-                bar_trace = go.Bar(
-                    y=metric_data[x_axis],
-                    x=metric_data[metric],
-                    name=metric_label,
-                    orientation='h',
-                    marker_color=color
-                )
-
-                if needs_normalization:
-                    bar_trace.hovertext = custom_hover_text
-                    bar_trace.hoverinfo = "text"
-                else:
-                    bar_trace.hovertemplate = f"{x_axis}: %{{y}}<br>{metric_label}: {hover_template}<extra></extra>"
-
-                self.fig.add_trace(bar_trace)
+            hover_value = self._get_hover_value(metric_type, needs_normalization)
+            self.fig.update_traces(
+                hovertemplate=f"{x_axis}: %{{{category_axis}}}<br>{metric_labels[metric]}: {hover_value}<extra></extra>",
+                selector=dict(name=metric_labels[metric])
+            )
 
         # Set axis labels and titles
         if orientation == 'v':
             # For normalized data, use a generic title
             if needs_normalization:
                 y_title = "Relative Scale (Normalized)"
-            elif len(metrics) == 1 and metric_labels:
+            elif len(metrics) == 1 and self.data_processor:
                 y_title = metric_labels.get(metrics[0], metrics[0])
             else:
                 y_title = "Value"
@@ -161,7 +128,7 @@ class BarChart:
             # For normalized data, use a generic title
             if needs_normalization:
                 x_title = "Relative Scale (Normalized)"
-            elif len(metrics) == 1 and metric_labels:
+            elif len(metrics) == 1 and self.data_processor:
                 x_title = metric_labels.get(metrics[0], metrics[0])
             else:
                 x_title = "Value"
@@ -195,76 +162,65 @@ class BarChart:
 
         return self.fig
 
+    def _get_hover_value(self, metric_type, needs_normalization):
+        """Get the hover format for a metric, reading the original value from customdata"""
+        if metric_type == 'currency':
+            return "£%{customdata[0]:,.2f}"
+        elif metric_type == 'percentage':
+            return "%{customdata[0]:.2f}%"
+        elif needs_normalization:
+            return "%{customdata[0]:,.0f}"
+        else:
+            return "%{customdata[0]}"
+
     def _aggregate_data_properly(self, data, x_axis, metrics):
         """Aggregate data using the appropriate method for each metric"""
-        if not self.data_processor:
-            # Fallback to sum if no data processor
-            return data.groupby(x_axis)[metrics].sum().reset_index()
-
-        # Group the data by x_axis
-        grouped_data = data.groupby(x_axis)
-
-        # Create aggregation dictionary
+        # Create aggregation dictionary, falling back to sum if no data processor
         agg_dict = {}
         for metric in metrics:
-            aggregation_type = self.data_processor.get_aggregation_type(metric)
-            if aggregation_type == 'average':
+            if self.data_processor and self.data_processor.get_aggregation_type(metric) == 'average':
                 agg_dict[metric] = 'mean'
             else:
                 agg_dict[metric] = 'sum'
 
         # Apply aggregation
-        result = grouped_data.agg(agg_dict).reset_index()
-
-        return result
-
-    def _check_scaling_needs(self, data, metrics):
-        """Check if metrics have very different scales that would require normalization"""
-        if len(metrics) <= 1:
-            return False
-
-        # Calculate the range (max - min) for each metric
-        ranges = []
-        for metric in metrics:
-            metric_data = data[metric]
-            if len(metric_data) > 0:
-                metric_range = metric_data.max() - metric_data.min()
-                if metric_range > 0:
-                    ranges.append(metric_range)
-
-        if len(ranges) <= 1:
-            return False
+        return aggregate_metrics(data, x_axis, agg_dict)
 
-        # Check if the ratio between largest and smallest range is > 100
-        # This indicates very different scales (e.g., 0.03 vs 50000)
-        max_range = max(ranges)
-        min_range = min(ranges)
+    def _scale_and_normalize(self, data, metrics):
+        """
+        Normalize metrics to a 0-100 scale when their ranges are very different
 
-        if min_range == 0:
-            return True  # One metric has no variation, definitely need normalization
+        The min and max of every metric come from one columnar pass over the metric block,
+        which both decides whether normalization is needed and drives it
 
-        ratio = max_range / min_range
-        return ratio > 10  # Threshold for when normalization is needed
-
-    def _normalize_metrics(self, data, metrics):
-        """Normalize metrics to 0-1 scale for better visualization"""
-        normalized_data = data.copy()
-
-        for metric in metrics:
-            metric_data = data[metric]
-
-            # Min-max normalization to 0-1 scale
-            min_val = metric_data.min()
-            max_val = metric_data.max()
-
-            if max_val > min_val:
-                # Scale to 0-100 for better visual representation
-                normalized_data[metric] = ((metric_data - min_val) / (max_val - min_val)) * 100
-            else:
-                # If all values are the same, set to a constant
-                normalized_data[metric] = 50  # Middle value
-
-        return normalized_data
+        Returns:
+            tuple: (data to plot, whether it was normalized)
+        """
+        if len(metrics) <= 1:
+            return data, False
+
+        metric_block = data[metrics]
+        min_vals = metric_block.min()
+        max_vals = metric_block.max()
+        ranges = (max_vals - min_vals).to_numpy(dtype=float)
+
+        # Metrics without variation don't count towards the scale comparison
+        varying = ranges > 0
+        if varying.sum() <= 1:
+            return data, False
+
+        # A ratio > 10 between the largest and smallest range indicates
+        # very different scales (e.g., 0.03 vs 50000)
+        if ranges[varying].max() / ranges[varying].min() <= 10:
+            return data, False
+
+        # Min-max normalization scaled to 0-100 for better visual representation.
+        # If all values of a metric are the same, set it to the middle value
+        values = metric_block.to_numpy(dtype=float, na_value=np.nan)
+        scaled = (values - min_vals.to_numpy(dtype=float)) / np.where(varying, ranges, 1) * 100
+        normalized = np.where(varying, scaled, 50.0)
+
+        return data.assign(**{metric: normalized[:, i] for i, metric in enumerate(metrics)}), True
 
     def _apply_style(self):
         if self.fig:
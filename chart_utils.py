@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+
+def apply_filters(data, filters):
+    """
+    Keep the rows of data whose values are allowed by filters
+
+    All filters are combined into one boolean mask and the data is indexed once,
+    instead of building a new DataFrame per filtered column
+    """
+    if not filters:
+        return data
+
+    masks = [data[column].isin(values).to_numpy() for column, values in filters.items()
+             if column in data.columns and values]
+    if not masks:
+        return data
+
+    return data.loc[np.logical_and.reduce(masks)]
+
+
+def aggregate_metrics(data, group_columns, agg_dict):
+    """
+    Group data by group_columns and aggregate each metric with 'sum' or 'mean'
+
+    The keys are factorized once into a single integer code per row and the metrics
+    are accumulated with np.bincount, avoiding pandas' per-group dispatch. The result
+    matches data.groupby(group_columns, observed=True).agg(agg_dict).reset_index()
+    """
+    if isinstance(group_columns, str):
+        group_columns = [group_columns]
+
+    # Only plain numpy numbers go through bincount. Timedeltas, nullable and Arrow-backed
+    # metrics take the regular pandas path, which keeps their dtype and missing values
+    for metric in agg_dict:
+        dtype = data[metric].dtype
+        if not isinstance(dtype, np.dtype) or dtype.kind not in 'iufb':
+            return data.groupby(group_columns, observed=True).agg(agg_dict).reset_index()
+
+    # Combine the per-column codes into one mixed-radix code per row
+    codes = np.zeros(len(data), dtype=np.int64)
+    valid = np.ones(len(data), dtype=bool)
+    levels = []
+    for column in group_columns:
+        try:
+            column_codes, uniques = pd.factorize(data[column], sort=True)
+        except TypeError:
+            # Keys that can't be sorted (e.g. mixed types) take the regular pandas path
+            return data.groupby(group_columns, observed=True).agg(agg_dict).reset_index()
+
+        valid &= column_codes >= 0  # groupby drops missing keys
+        codes = codes * max(len(uniques), 1) + column_codes
+        levels.append((column, uniques))
+
+    # Compress to the observed groups. np.unique sorts, so groups come out in key order
+    group_codes, inverse = np.unique(codes[valid], return_inverse=True)
+    n_groups = len(group_codes)
+
+    result = {}
+    remainder = group_codes
+    for column, uniques in reversed(levels):
+        result[column] = uniques.take(remainder % max(len(uniques), 1))
+        remainder = remainder // max(len(uniques), 1)
+    result = {column: result[column] for column in group_columns}
+
+    for metric, how in agg_dict.items():
+        values = data[metric].to_numpy()[valid]
+        if how != 'mean' and values.dtype.kind in 'iub':
+            # Integer totals are accumulated as integers; bincount's float64 weights would
+            # round group totals past 2**53
+            sums = np.zeros(n_groups, dtype=np.uint64 if values.dtype.kind == 'u' else np.int64)
+            np.add.at(sums, inverse, values)
+            result[metric] = sums
+            continue
+
+        weights = values.astype(np.float64)
+        present = ~np.isnan(weights)  # NaNs are skipped, as in pandas
+
+        sums = np.bincount(inverse[present], weights=weights[present], minlength=n_groups)
+        if how == 'mean':
+            counts = np.bincount(inverse[present], minlength=n_groups)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result[metric] = sums / counts
+        else:
+            result[metric] = sums
+
+    # Every result column is its own contiguous 1-D array, so the frame is already
+    # column-major and per-metric reads downstream are sequential
+    return pd.DataFrame(result)
@@ -2,79 +2,324 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import re
+import os
+import hashlib
+import io
+import tempfile
+import time
+from importlib import metadata
+
+# All supported date formats combined into one regex, compiled once at import.
+# Named groups record which format matched the sample value
+_DATE_RE = re.compile(
+    r'(?P<iso>\d{4}-\d{1,2}-\d{1,2})'  # YYYY-MM-DD
+    r'|(?P<iso_month>\d{4}-\d{1,2})'  # YYYY-MM (month only)
+    r'|(?P<dashed>\d{1,2}-\d{1,2}-\d{4})'  # DD-MM-YYYY or MM-DD-YYYY
+    r'|(?P<slashed>\d{1,2}/\d{1,2}/\d{4})'  # DD/MM/YYYY or MM/DD/YYYY
+    r'|(?P<slashed_short>\d{1,2}/\d{1,2}/\d{2})'  # DD/MM/YY or MM/DD/YY
+    r'|(?P<slashed_month>\d{4}/\d{1,2})'  # YYYY/MM (month only)
+    r'|(?P<day_month_name>\d{1,2}\s+[a-zA-Z]{3,}\s+\d{4})'  # DD Month YYYY
+    r'|(?P<month_name_day>[a-zA-Z]{3,}\s+\d{1,2},?\s+\d{4})'  # Month DD, YYYY
+)
+
+def _compile_patterns(patterns):
+    """Combine name fragments into one regex that matches any of them"""
+    return re.compile('|'.join(map(re.escape, patterns)))
+
+
+# Metric name patterns, compiled once at import so each metric name is scanned in a single pass.
+# Rules are checked in order and the first match wins
+_METRIC_RULES = (
+    # ROAS is a ratio, even though its name looks like a currency
+    (_compile_patterns(['roas']), 'percentage', 'average'),
+    # Cost-per-X metrics (currency but should be averaged, not summed)
+    (_compile_patterns(['cpm', 'cpc', 'cpa', 'cpv', 'cpl', 'cpi', 'cost_per']), 'currency', 'average'),
+    # Costs/revenue should be summed
+    (_compile_patterns([
+        'cost', 'spend', 'revenue', 'budget', 'value', 'conversion_value'
+    ]), 'currency', 'sum'),
+    # Rates should be averaged
+    (_compile_patterns([
+        'cvr', 'ctr', 'rate', 'percent', '%', 'ratio', 'frequency',
+        'engagement_rate', 'conversion_rate', 'view_rate', 'completion_rate',
+        'bounce_rate', 'click_through_rate'
+    ]), 'percentage', 'average'),
+    # Count/volume metrics (should be summed)
+    (_compile_patterns([
+        'impressions', 'clicks', 'views', 'reach', 'conversions', 'leads',
+        'purchases', 'installs', 'downloads', 'shares', 'likes', 'comments',
+        'sessions', 'users', 'visitors', 'pageviews', 'orders', 'transactions'
+    ]), 'number', 'sum'),
+    # Time-based metrics (should be averaged)
+    (_compile_patterns([
+        'watch_time', 'session_duration', 'time_on_page', 'duration',
+        'avg_time', 'average_time'
+    ]), 'number', 'average'),
+)
+
+# Directory for Parquet copies of previously parsed files
+_CACHE_DIR = '.cache'
+
+# Entries unused for longer than this are deleted, so uploaded reports don't stay on disk
+# indefinitely, and the least recently used entries go once the cache passes the size limit
+_CACHE_MAX_AGE = 7 * 24 * 60 * 60  # seconds
+_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Errors that mean a cache entry can't be read, in which case the file is parsed again
+try:
+    from pyarrow.lib import ArrowException
+    _CACHE_READ_ERRORS = (OSError, ArrowException)
+except ImportError:
+    # Without pyarrow, read_parquet raises ImportError and nothing could be cached anyway
+    _CACHE_READ_ERRORS = (OSError, ImportError)
+
+# Bump when the parsing or date detection changes what gets cached
+_CACHE_FORMAT_VERSION = 1
+
+
+def _package_version(name):
+    """Installed version of a package, or 'none' if it isn't installed"""
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return 'none'
+
+
+# Part of every cache key, so upgrading (or installing) a reader invalidates the files it parsed
+_CACHE_VERSION = ':'.join(
+    [str(_CACHE_FORMAT_VERSION)]
+    + [_package_version(name) for name in ('pandas', 'pyarrow', 'python-calamine', 'openpyxl')]
+)
 
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, downcast_metrics=True):
         self.data = None
+        self.downcast_metrics = downcast_metrics  # Store integer metrics as int32 where they fit
         self.metrics = []
         self.dimensions = []
         self.date_columns = []
         self.metric_types = {}  # To store the type of each metric (currency, percentage, etc.)
         self.aggregation_types = {}  # To store how metrics should be aggregated (sum, average)
+        self._code_cache = {}  # Category codes per categorical column, reused across filter calls
+        self._unique_cache = {}  # Sorted unique values per column
+        self._date_range_cache = {}  # (min, max) per date column
+        self._filter_cache = None  # (filter signature, filtered data) of the last filter_data call
+        self._group_agg_cache = (None, {})  # (data, {(group_by, agg_map): aggregate}) of the last aggregate_groups data
 
-    def load_data(self, file):
+    def load_data(self, file, columns=None, engine='pyarrow', content_key=None):
         """
         Load data from an uploaded file (CSV or Excel)
         Works with either a string path or a Streamlit UploadedFile object
+
+        Args:
+            file: Path or uploaded file to read
+            columns (list): Optional list of columns to load; the other columns are never parsed
+            engine (str): CSV parser, 'pyarrow' (multi-threaded, falls back to 'c') or 'c'
+            content_key (str): Optional digest of the file's content, used as its cache key
+                instead of hashing the content again
         """
-        # Handle Streamlit UploadedFile objects
-        if hasattr(file, 'name'):
-            # This is a Streamlit UploadedFile object
-            file_name = file.name.lower()
-            if file_name.endswith('.xlsx'):
-                self.data = pd.read_excel(file)
-            elif file_name.endswith('.csv'):
-                self.data = pd.read_csv(file)
-            else:
-                raise ValueError("Unsupported file format. Please use .xlsx or .csv")
-        else:
-            # This is a regular file path string
-            file_path = str(file).lower()
-            if file_path.endswith('.xlsx'):
-                self.data = pd.read_excel(file)
-            elif file_path.endswith('.csv'):
-                self.data = pd.read_csv(file)
+        cache_path = self._get_cache_path(file, engine, content_key)
+
+        # Dtypes (including parsed dates) survive the round trip, so a cache hit skips date detection
+        self.data = self._read_cache(cache_path, columns)
+        if self.data is None:
+            # Handle Streamlit UploadedFile objects
+            if hasattr(file, 'name'):
+                # This is a Streamlit UploadedFile object
+                file_name = file.name.lower()
+                if file_name.endswith('.xlsx'):
+                    self.data = self._read_excel(file, columns)
+                elif file_name.endswith('.csv'):
+                    self.data = self._read_csv(file, columns, engine)
+                else:
+                    raise ValueError("Unsupported file format. Please use .xlsx or .csv")
             else:
-                raise ValueError("Unsupported file format. Please use .xlsx or .csv")
-
-        # Automatically detect and convert date columns
-        self._convert_date_columns()
+                # This is a regular file path string
+                file_path = str(file).lower()
+                if file_path.endswith('.xlsx'):
+                    self.data = self._read_excel(file, columns)
+                elif file_path.endswith('.csv'):
+                    self.data = self._read_csv(file, columns, engine)
+                else:
+                    raise ValueError("Unsupported file format. Please use .xlsx or .csv")
+
+            # Automatically detect and convert date columns
+            self._convert_date_columns()
+
+            # Only full loads are cached, so a column subset never stands in for the whole file
+            if columns is None:
+                self._write_cache(cache_path)
+
+        self._clear_caches()
         self._identify_columns()
         self._identify_metric_types()
         return self.data
 
+    def load_from_bytes(self, file_bytes, name, columns=None, engine='pyarrow', content_key=None):
+        """Load data from the raw bytes of an uploaded file, using its name to pick the parser"""
+        file = io.BytesIO(file_bytes)
+        file.name = name
+        return self.load_data(file, columns, engine, content_key)
+
+    def _clear_caches(self):
+        """Forget everything memoized from the previous data"""
+        self._code_cache = {}
+        self._unique_cache = {}
+        self._date_range_cache = {}
+        self._filter_cache = None
+        self._group_agg_cache = (None, {})
+
+    def _get_cache_path(self, file, engine='pyarrow', content_key=None):
+        """Get the Parquet cache path for a file, keyed by upload content or by path and mtime"""
+        if content_key is not None:
+            # The caller already hashed the content
+            source = content_key
+        elif hasattr(file, 'getvalue'):
+            # Content only, so the same report uploaded again under another name still hits the cache
+            source = hashlib.sha256(file.getvalue()).hexdigest()
+        elif isinstance(file, (str, os.PathLike)) and os.path.exists(file):
+            source = f"{os.path.abspath(file)}:{os.path.getmtime(file)}"
+        else:
+            return None
+
+        # The parser and library versions are part of the key, so an entry is only reused
+        # for data parsed the same way
+        key = hashlib.sha256(f"{_CACHE_VERSION}:{engine}:{source}".encode()).hexdigest()
+        return os.path.join(_CACHE_DIR, f"{key}.parquet")
+
+    def _read_cache(self, cache_path, columns=None):
+        """Read a file's Parquet cache entry, or return None if there is no usable entry"""
+        if cache_path is None or not os.path.exists(cache_path):
+            return None
+
+        try:
+            data = pd.read_parquet(cache_path, engine='pyarrow', columns=columns, memory_map=True)
+        except _CACHE_READ_ERRORS:
+            # A truncated entry, one from an incompatible pyarrow, or one another session just
+            # evicted. Drop it and let the caller parse the source file instead
+            try:
+                os.remove(cache_path)
+            except OSError:
+                pass
+            return None
+
+        self._touch_cache(cache_path)
+        return data
+
+    def _write_cache(self, cache_path):
+        """Save the parsed data as Parquet so the next load of the same file skips parsing"""
+        if cache_path is None:
+            return
+
+        tmp_path = None
+        try:
+            os.makedirs(_CACHE_DIR, exist_ok=True)
+            # Write to a temporary file first so a failed write never leaves a partial cache entry.
+            # Each writer gets its own temporary file, since sessions uploading the same file
+            # share the cache path. zstd keeps the cache files small and still decompresses
+            # faster than the file parses
+            fd, tmp_path = tempfile.mkstemp(dir=_CACHE_DIR, suffix='.tmp')
+            os.close(fd)
+            self.data.to_parquet(tmp_path, engine='pyarrow', compression='zstd')
+            os.replace(tmp_path, cache_path)
+        except Exception:
+            # Caching is best effort, e.g. mixed-type columns Parquet can't store
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        self._evict_cache()
+
+    def _touch_cache(self, cache_path):
+        """Mark a cache entry as just used, so eviction removes it last"""
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+
+    def _evict_cache(self):
+        """Delete cache entries older than _CACHE_MAX_AGE, then the least recently used until under _CACHE_MAX_BYTES"""
+        try:
+            with os.scandir(_CACHE_DIR) as entries:
+                files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                               for entry in entries if entry.is_file())
+        except OSError:
+            return
+
+        # Oldest first: stop at the first entry that is recent enough while the cache fits
+        now = time.time()
+        total_size = sum(size for _, size, _ in files)
+        for mtime, size, path in files:
+            if now - mtime <= _CACHE_MAX_AGE and total_size <= _CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError:
+                pass  # Another session removed or is replacing it
+
+    def _read_excel(self, file, columns=None):
+        """Read an xlsx with the Rust calamine reader, falling back to openpyxl"""
+        try:
+            return pd.read_excel(file, engine='calamine', usecols=columns)
+        except ImportError:
+            # python-calamine not installed
+            if hasattr(file, 'seek'):
+                file.seek(0)
+
+        return pd.read_excel(file, usecols=columns)
+
+    def _read_csv(self, file, columns=None, engine='pyarrow'):
+        """Read a CSV with the multi-threaded PyArrow parser, falling back to the default C engine"""
+        if engine == 'pyarrow':
+            try:
+                return pd.read_csv(file, engine='pyarrow', usecols=columns)
+            except Exception:
+                # PyArrow not installed or the file uses something its parser rejects
+                if hasattr(file, 'seek'):
+                    file.seek(0)
+
+        # low_memory=False infers each column's dtype from the whole file instead of per chunk
+        return pd.read_csv(file, usecols=columns, low_memory=False)
+
     def _convert_date_columns(self):
         """
         Automatically detect and convert columns that might contain dates
         Handles multiple date formats
         """
-        date_patterns = [
-            r'\d{4}-\d{1,2}-\d{1,2}',  # YYYY-MM-DD
-            r'\d{4}-\d{1,2}',  # YYYY-MM (month only)
-            r'\d{1,2}-\d{1,2}-\d{4}',  # DD-MM-YYYY or MM-DD-YYYY
-            r'\d{1,2}/\d{1,2}/\d{4}',  # DD/MM/YYYY or MM/DD/YYYY
-            r'\d{1,2}/\d{1,2}/\d{2}',  # DD/MM/YY or MM/DD/YY
-            r'\d{4}/\d{1,2}',  # YYYY/MM (month only)
-            r'\d{1,2}\s+[a-zA-Z]{3,}\s+\d{4}',  # DD Month YYYY
-            r'[a-zA-Z]{3,}\s+\d{1,2},?\s+\d{4}'  # Month DD, YYYY
-        ]
-
         for col in self.data.columns:
             # Check if column name suggests it might be a date
             col_lower = col.lower()
             if any(hint in col_lower for hint in ['date', 'day', 'time', 'month', 'year']):
-                # Get first non-null value to check if it looks like a date
-                if self.data[col].notna().any():
-                    sample_value = str(self.data[col].dropna().iloc[0])
+                column = self.data[col]
+
+                # Columns the reader already parsed as dates are picked up by _identify_columns
+                if pd.api.types.is_datetime64_any_dtype(column):
+                    continue
+
+                # Get first non-null value to check if it looks like a date, without copying
+                # the non-null part of the column just to read one value
+                valid = column.notna().to_numpy()
+                if valid.any():
+                    sample_value = str(column.iloc[valid.argmax()])
 
                     # Check if it matches any date pattern
-                    is_date_like = any(re.search(pattern, sample_value) for pattern in date_patterns)
+                    date_match = _DATE_RE.search(sample_value)
 
-                    if is_date_like:
+                    if date_match is not None:
                         try:
-                            # Try to convert using pandas
-                            self.data[col] = pd.to_datetime(self.data[col], errors='coerce')
+                            # Try to convert using pandas. ISO dates take the fast ISO8601 path;
+                            # other formats are ambiguous (DD/MM vs MM/DD) so pandas infers them
+                            date_format = None
+                            if date_match.lastgroup in ('iso', 'iso_month') and date_match.start() == 0:
+                                date_format = 'ISO8601'
+
+                            # cache=True parses each unique string once
+                            self.data[col] = pd.to_datetime(self.data[col], format=date_format, errors='coerce', cache=True)
 
                             # Keep track of date columns
                             if self.data[col].notna().any():  # Only add if conversion worked
@@ -84,76 +329,59 @@ class DataProcessor:
                             pass  # Skip if conversion fails
 
     def _identify_columns(self):
+        # Classify every column in one pass over the dtypes: kind 'M' is datetime, and
+        # 'i'/'u'/'f'/'c'/'m' are the kinds select_dtypes(np.number) picked up (timedeltas included)
+        kinds = [dtype.kind for dtype in self.data.dtypes]
+
         # First identify date columns from automatic detection
-        date_cols = [col for col in self.data.columns if pd.api.types.is_datetime64_any_dtype(self.data[col])]
+        date_cols = [col for col, kind in zip(self.data.columns, kinds) if kind == 'M']
         self.date_columns = list(set(self.date_columns + date_cols))
 
         # Then identify numeric columns (metrics)
-        numeric_cols = self.data.select_dtypes(include=[np.number]).columns.tolist()
+        numeric_cols = [col for col, kind in zip(self.data.columns, kinds) if kind in 'iufcm']
+
+        if self.downcast_metrics:
+            self._downcast_numeric_columns(numeric_cols)
 
         # Set metrics and dimensions
         self.metrics = numeric_cols
-        self.dimensions = [col for col in self.data.columns if col not in numeric_cols or col in date_cols]
+        numeric_set = set(numeric_cols)
+        self.dimensions = [col for col, kind in zip(self.data.columns, kinds) if col not in numeric_set or kind == 'M']
+
+        # Store low-cardinality text dimensions as categoricals so filters and
+        # groupbys work on integer codes instead of hashing strings each time
+        if len(self.data) > 0:
+            for col in self.dimensions:
+                if col not in self.date_columns and pd.api.types.is_string_dtype(self.data[col].dtype):
+                    if self.data[col].nunique() / len(self.data) < 0.5:
+                        self.data[col] = self.data[col].astype('category')
+
+    def _downcast_numeric_columns(self, numeric_cols):
+        """Store integer metrics as int32 when every value fits"""
+        # Float metrics stay float64: float32 totals drift once they pass 2**24, which
+        # would show up as wrong pennies in the summed currency figures
+        info = np.iinfo(np.int32)
+        for col in numeric_cols:
+            values = self.data[col].to_numpy()
+            if values.dtype == np.int64 and len(values) > 0:
+                if info.min <= values.min() and values.max() <= info.max:
+                    self.data[col] = values.astype(np.int32)
 
     def _identify_metric_types(self):
         """Identify metric types and aggregation methods based on their names and patterns"""
-
-        # Define patterns for different types of metrics
-        currency_patterns = [
-            'cost', 'spend', 'revenue', 'budget', 'value', 'conversion_value', 'roas'
-        ]
-
-        # Cost-per-X metrics (currency but should be averaged, not summed)
-        cost_per_patterns = [
-            'cpm', 'cpc', 'cpa', 'cpv', 'cpl', 'cpi', 'cost_per'
-        ]
-
-        count_patterns = [
-            'impressions', 'clicks', 'views', 'reach', 'conversions', 'leads',
-            'purchases', 'installs', 'downloads', 'shares', 'likes', 'comments',
-            'sessions', 'users', 'visitors', 'pageviews', 'orders', 'transactions'
-        ]
-
-        percentage_patterns = [
-            'cvr', 'ctr', 'rate', 'percent', '%', 'ratio', 'frequency', 'roas',
-            'engagement_rate', 'conversion_rate', 'view_rate', 'completion_rate',
-            'bounce_rate', 'click_through_rate'
-        ]
-
-        # Count/volume metrics (should be summed)
-
-        # Time-based metrics (should be averaged)
-        time_patterns = [
-            'watch_time', 'session_duration', 'time_on_page', 'duration',
-            'avg_time', 'average_time'
-        ]
-
         for metric in self.metrics:
             metric_lower = metric.lower()
 
-            # Check aggregation type and metric type
-            if 'roas' in metric_lower:
-                self.metric_types[metric] = 'percentage'
-                self.aggregation_types[metric] = 'average'
-            elif any(pattern in metric_lower for pattern in cost_per_patterns):
-                self.metric_types[metric] = 'currency'
-                self.aggregation_types[metric] = 'average'  # CPCs should be averaged
-            elif any(pattern in metric_lower for pattern in currency_patterns):
-                self.metric_types[metric] = 'currency'
-                self.aggregation_types[metric] = 'sum'  # Costs/revenue should be summed
-            elif any(pattern in metric_lower for pattern in percentage_patterns):
-                self.metric_types[metric] = 'percentage'
-                self.aggregation_types[metric] = 'average'  # Rates should be averaged
-            elif any(pattern in metric_lower for pattern in count_patterns):
-                self.metric_types[metric] = 'number'
-                self.aggregation_types[metric] = 'sum'  # Counts should be summed
-            elif any(pattern in metric_lower for pattern in time_patterns):
-                self.metric_types[metric] = 'number'
-                self.aggregation_types[metric] = 'average'  # Time metrics should be averaged
+            # The first matching rule decides the metric type and aggregation method
+            for pattern, metric_type, aggregation_type in _METRIC_RULES:
+                if pattern.search(metric_lower):
+                    break
             else:
                 # Default behavior
-                self.metric_types[metric] = 'number'
-                self.aggregation_types[metric] = 'sum'  # Default to sum
+                metric_type, aggregation_type = 'number', 'sum'
+
+            self.metric_types[metric] = metric_type
+            self.aggregation_types[metric] = aggregation_type
 
     def filter_data(self, filters, date_range_filters=None):
         """
@@ -166,29 +394,106 @@ class DataProcessor:
         Returns:
             pandas.DataFrame: Filtered data
         """
-        filtered_data = self.data.copy()
+        active_filters = {column: values for column, values in filters.items()
+                          if column in self.data.columns and values}
+        active_date_filters = {column: date_range for column, date_range in (date_range_filters or {}).items()
+                               if column in self.data.columns and pd.api.types.is_datetime64_any_dtype(self.data[column])
+                               and any(date_range)}
+
+        # Nothing selected (the default dashboard state), so there is no mask to build
+        if not active_filters and not active_date_filters:
+            return self.data
+
+        # Reruns that didn't touch the filters (e.g. a color change) reuse the last result
+        signature = (
+            frozenset((column, frozenset(values)) for column, values in active_filters.items()),
+            frozenset(active_date_filters.items())
+        )
+        if self._filter_cache is not None and self._filter_cache[0] == signature:
+            return self._filter_cache[1]
+
+        # Build a single boolean mask and index the data once at the end
+        mask = np.ones(len(self.data), dtype=bool)
 
         # Apply categorical filters
-        for column, values in filters.items():
-            if column in self.data.columns and values:
-                filtered_data = filtered_data[filtered_data[column].isin(values)]
+        for column, values in active_filters.items():
+            mask &= self._isin_mask(column, values)
 
         # Apply date range filters
-        if date_range_filters:
-            for column, (start_date, end_date) in date_range_filters.items():
-                if column in self.data.columns and pd.api.types.is_datetime64_any_dtype(self.data[column]):
-                    if start_date and end_date:
-                        filtered_data = filtered_data[
-                            (filtered_data[column] >= start_date) &
-                            (filtered_data[column] <= end_date)
-                            ]
-                    elif start_date:
-                        filtered_data = filtered_data[filtered_data[column] >= start_date]
-                    elif end_date:
-                        filtered_data = filtered_data[filtered_data[column] <= end_date]
-
+        for column, (start_date, end_date) in active_date_filters.items():
+            if start_date:
+                mask &= (self.data[column] >= start_date).to_numpy()
+            if end_date:
+                mask &= (self.data[column] <= end_date).to_numpy()
+
+        filtered_data = self.data.loc[mask]
+        self._filter_cache = (signature, filtered_data)
         return filtered_data
 
+    def aggregate_groups(self, data, group_by, agg_map):
+        """
+        Aggregate every metric for every group_by value in one groupby
+
+        Results are memoized for the data frame last passed in. filter_data hands back the
+        same frame for the same filters, and the cache keeps that frame alive, so checking
+        its identity can't mistake a new frame for an old one
+
+        Args:
+            data (pandas.DataFrame): Data to aggregate, usually the result of filter_data
+            group_by (str): Column to group by
+            agg_map (tuple): (metric, aggregation) pairs
+
+        Returns:
+            pandas.DataFrame: One row per group, in order of first appearance
+        """
+        cached_data, aggregates = self._group_agg_cache
+        if cached_data is not data:
+            aggregates = {}
+            self._group_agg_cache = (data, aggregates)
+
+        key = (group_by, agg_map)
+        if key not in aggregates:
+            aggregates[key] = data.groupby(group_by, sort=False, observed=True, dropna=False).agg(dict(agg_map))
+        return aggregates[key]
+
+    def convert_date_column(self, column):
+        """
+        Convert a column the user picked as the date column
+
+        Tries pandas' fast ISO8601 parser first and only falls back to per-value
+        inference when nothing parses. Day-first is preferred for ambiguous dates
+
+        Returns:
+            bool: True if any value could be converted
+        """
+        # cache=True parses each distinct date string once, however many rows repeat it
+        parsed = pd.to_datetime(self.data[column], format='ISO8601', errors='coerce', cache=True)
+        if parsed.notna().sum() == 0:
+            parsed = pd.to_datetime(self.data[column], format='mixed', dayfirst=True, errors='coerce', cache=True)
+
+        if parsed.notna().sum() == 0:
+            return False
+
+        self.data[column] = parsed
+        if column not in self.date_columns:
+            self.date_columns.append(column)
+        self._clear_caches()
+        return True
+
+    def _isin_mask(self, column, values):
+        """Get a boolean mask of rows whose value is in values, using category codes when possible"""
+        series = self.data[column]
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            if column not in self._code_cache:
+                self._code_cache[column] = series.cat.codes.to_numpy()
+
+            # Values that are not categories get -1, which would match missing values
+            target_codes = series.cat.categories.get_indexer(values)
+            return np.isin(self._code_cache[column], target_codes[target_codes >= 0])
+
+        return series.isin(values).to_numpy()
+
     def get_metrics(self):
         return self.metrics
 
@@ -200,20 +505,29 @@ class DataProcessor:
 
     def get_unique_values(self, column):
         if column in self.data.columns:
-            if pd.api.types.is_datetime64_any_dtype(self.data[column]):
-                # For date columns, return min and max dates
-                return sorted(self.data[column].unique())
-            else:
-                # For other columns, return sorted unique values
-                return sorted(self.data[column].unique().tolist())
+            if column not in self._unique_cache:
+                # Sort in native code and only convert to Python objects at the end
+                if pd.api.types.is_datetime64_any_dtype(self.data[column]):
+                    # For date columns, return the distinct dates in order
+                    self._unique_cache[column] = self.data[column].dropna().drop_duplicates().sort_values().tolist()
+                elif isinstance(self.data[column].dtype, pd.CategoricalDtype):
+                    # Categories are already the sorted unique values
+                    self._unique_cache[column] = self.data[column].cat.categories.tolist()
+                elif pd.api.types.is_numeric_dtype(self.data[column]):
+                    self._unique_cache[column] = np.sort(self.data[column].dropna().unique()).tolist()
+                else:
+                    # For other columns, return sorted unique values
+                    unique_values = pd.Series(self.data[column].dropna().unique())
+                    self._unique_cache[column] = unique_values.sort_values().tolist()
+            return self._unique_cache[column]
         return []
 
     def get_date_range(self, column):
         """Get the minimum and maximum dates in a date column"""
         if column in self.data.columns and pd.api.types.is_datetime64_any_dtype(self.data[column]):
-            min_date = self.data[column].min()
-            max_date = self.data[column].max()
-            return min_date, max_date
+            if column not in self._date_range_cache:
+                self._date_range_cache[column] = (self.data[column].min(), self.data[column].max())
+            return self._date_range_cache[column]
         return None, None
 
     def get_metric_type(self, metric):
@@ -241,9 +555,9 @@ class DataProcessor:
 
         if group_columns:
             if aggregation_type == 'average':
-                return data.groupby(group_columns)[metric].mean().reset_index()
+                return data.groupby(group_columns, observed=True)[metric].mean().reset_index()
             else:
-                return data.groupby(group_columns)[metric].sum().reset_index()
+                return data.groupby(group_columns, observed=True)[metric].sum().reset_index()
         else:
             if aggregation_type == 'average':
                 return data[metric].mean()
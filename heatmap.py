@@ -3,6 +3,7 @@ import plotly.graph_objects as go
 import numpy as np
 import pandas as pd
 from tiktok_style import TikTokStyle
+from chart_utils import aggregate_metrics, apply_filters
 
 
 class HeatMap:
@@ -12,32 +13,19 @@ class HeatMap:
         self.data_processor = data_processor
 
     def create_chart(self, data, x_axis, y_axis, metric, filters=None):
-        if filters:
-            for column, values in filters.items():
-                if column in data.columns and values:
-                    data = data[data[column].isin(values)]
-
-        # Sort data if using dates on x-axis
-        if 'date' in x_axis.lower() or 'day' in x_axis.lower():
-            if hasattr(data[x_axis], 'dt'):  # Check if it's a datetime column
-                data = data.sort_values(by=x_axis)
+        data = apply_filters(data, filters)
 
         # Hide zero values if enabled
         if self.style.hide_zero_values:
             data = data[data[metric] != 0]
 
-        # Create pivot table
-        pivot_data = data.pivot_table(
-            values=metric,
-            index=y_axis,
-            columns=x_axis,
-            aggfunc='mean',
-            fill_value=np.nan if self.style.hide_zero_values else 0
-        )
-
-        # Replace zeros with NaN to hide them in the heatmap if hide_zero_values is enabled
-        if self.style.hide_zero_values:
-            pivot_data = pivot_data.replace(0, np.nan)
+        # Average the metric per (y, x) cell and pivot the cells into a grid. Only observed
+        # cells are aggregated, and the grid's columns come out sorted, so dates are in order.
+        # Empty cells are NaN, which leaves them blank when zeros are hidden (zero rows were dropped above)
+        cell_data = aggregate_metrics(data, [y_axis, x_axis], {metric: 'mean'})
+        pivot_data = cell_data.pivot(index=y_axis, columns=x_axis, values=metric)
+        if not self.style.hide_zero_values:
+            pivot_data = pivot_data.fillna(0)
 
         # Get the metric label and type
         metric_label = metric
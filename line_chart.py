@@ -3,6 +3,7 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 from tiktok_style import TikTokStyle
+from chart_utils import aggregate_metrics, apply_filters
 
 
 class LineChart:
@@ -13,16 +14,14 @@ class LineChart:
 
     def create_chart(self, data, x_axis, y_axis, group_by=None, filters=None, secondary_y_axis=None):
         # Apply filters if provided
-        if filters:
-            for column, values in filters.items():
-                if column in data.columns and values:
-                    data = data[data[column].isin(values)]
+        data = apply_filters(data, filters)
 
         # Ensure proper data formatting for time series data
         if 'date' in x_axis.lower() or 'day' in x_axis.lower():
             if not pd.api.types.is_datetime64_any_dtype(data[x_axis]):
                 try:
-                    data[x_axis] = pd.to_datetime(data[x_axis])
+                    # assign returns a new frame, leaving the caller's data untouched
+                    data = data.assign(**{x_axis: pd.to_datetime(data[x_axis])})
                 except:
                     pass
 
@@ -48,162 +47,30 @@ class LineChart:
         # Initialize figure
         self.fig = go.Figure()
 
-        # Handle zero values if hide_zero_values is enabled
-        if self.style.hide_zero_values:
-            if group_by and group_by in data.columns:
-                self._add_grouped_data_with_zero_handling(data, x_axis, y_axis, group_by, metric_type, y_axis_title, False)
-                if secondary_y_axis:
-                    self._add_grouped_data_with_zero_handling(data, x_axis, secondary_y_axis, group_by, secondary_metric_type, secondary_y_axis_title, True)
-            else:
-                self._add_ungrouped_data_with_zero_handling(data, x_axis, y_axis, metric_type, y_axis_title, False)
-                if secondary_y_axis:
-                    self._add_ungrouped_data_with_zero_handling(data, x_axis, secondary_y_axis, secondary_metric_type, secondary_y_axis_title, True)
+        # Aggregate the primary and secondary metric in one groupby. The groupby sorts by
+        # its keys, so every line below is already in x order
+        group_columns = [x_axis, group_by] if group_by and group_by in data.columns else [x_axis]
+        metrics = [y_axis, secondary_y_axis] if secondary_y_axis else [y_axis]
+        groups = None
+        if self.style.hide_zero_values and len(group_columns) == 1:
+            # Ungrouped lines drop zero rows before aggregating, so averaged metrics (e.g. CTR)
+            # are the mean of the non-zero rows. Each metric drops its own zero rows
+            metric_data = {
+                metric: self._aggregate_data_properly(data[data[metric] != 0], group_columns, [metric])
+                for metric in metrics
+            }
         else:
-            # Standard behavior when not hiding zeros
-            if group_by and group_by in data.columns:
-                # PRIMARY Y-AXIS TRACES
-                grouped_data_primary = self._aggregate_data_properly(data, [x_axis, group_by], [y_axis])
-                if pd.api.types.is_datetime64_any_dtype(grouped_data_primary[x_axis]):
-                    grouped_data_primary = grouped_data_primary.sort_values(by=x_axis)
-
-                groups = grouped_data_primary[group_by].unique()
-
-                # Add PRIMARY traces first
-                for i, group_value in enumerate(groups):
-                    group_data = grouped_data_primary[grouped_data_primary[group_by] == group_value]
-                    color = self.style.color_sequence[i % len(self.style.color_sequence)]
-
-                    hover_template = "%{y}"
-                    if metric_type == 'currency':
-                        hover_template = "£%{y:,.2f}"
-                    elif metric_type == 'percentage':
-                        hover_template = "%{y:.2f}%"
-
-                    self.fig.add_trace(
-                        go.Scatter(
-                            x=group_data[x_axis],
-                            y=group_data[y_axis],
-                            mode='lines+markers' if self.style.show_markers else 'lines',
-                            name=f"{group_value} - {y_axis}",
-                            line=dict(
-                                color=color,
-                                width=self.style.line_width,
-                                shape=self.style.line_shape
-                            ),
-                            marker=dict(
-                                size=self.style.marker_size if self.style.show_markers else 0,
-                                color=color
-                            ),
-                            hovertemplate=f"{x_axis}: %{{x}}<br>{y_axis_title}: {hover_template}<extra></extra>"
-                        )
-                    )
-
-                # SECONDARY Y-AXIS TRACES
-                if secondary_y_axis:
-                    grouped_data_secondary = self._aggregate_data_properly(data, [x_axis, group_by], [secondary_y_axis])
-                    if pd.api.types.is_datetime64_any_dtype(grouped_data_secondary[x_axis]):
-                        grouped_data_secondary = grouped_data_secondary.sort_values(by=x_axis)
-
-                    for i, group_value in enumerate(groups):
-                        group_data = grouped_data_secondary[grouped_data_secondary[group_by] == group_value]
-                        # Use SAME color as primary but make it secondary axis
-                        color = self.style.color_sequence[i % len(self.style.color_sequence)]
-
-                        hover_template = "%{y}"
-                        if secondary_metric_type == 'currency':
-                            hover_template = "£%{y:,.2f}"
-                        elif secondary_metric_type == 'percentage':
-                            hover_template = "%{y:.2f}%"
-
-                        self.fig.add_trace(
-                            go.Scatter(
-                                x=group_data[x_axis],
-                                y=group_data[secondary_y_axis],
-                                mode='lines+markers' if self.style.show_markers else 'lines',
-                                name=f"{group_value} - {secondary_y_axis}",
-                                line=dict(
-                                    color=color,
-                                    width=self.style.line_width,
-                                    shape=self.style.line_shape,
-                                    dash='dash'
-                                ),
-                                marker=dict(
-                                    size=self.style.marker_size if self.style.show_markers else 0,
-                                    color=color,
-                                    symbol='square'
-                                ),
-                                hovertemplate=f"{x_axis}: %{{x}}<br>{secondary_y_axis_title}: {hover_template}<extra></extra>",
-                                yaxis="y2"
-                            )
-                        )
-            else:
-                # NON-GROUPED DATA
-                grouped_data_primary = self._aggregate_data_properly(data, [x_axis], [y_axis])
-                if pd.api.types.is_datetime64_any_dtype(grouped_data_primary[x_axis]):
-                    grouped_data_primary = grouped_data_primary.sort_values(by=x_axis)
-
-                hover_template = "%{y}"
-                if metric_type == 'currency':
-                    hover_template = "£%{y:,.2f}"
-                elif metric_type == 'percentage':
-                    hover_template = "%{y:.2f}%"
-
-                # Add PRIMARY trace
-                self.fig.add_trace(
-                    go.Scatter(
-                        x=grouped_data_primary[x_axis],
-                        y=grouped_data_primary[y_axis],
-                        mode='lines+markers' if self.style.show_markers else 'lines',
-                        name=y_axis,
-                        line=dict(
-                            color=self.style.line_color,
-                            width=self.style.line_width,
-                            shape=self.style.line_shape
-                        ),
-                        marker=dict(
-                            size=self.style.marker_size if self.style.show_markers else 0,
-                            color=self.style.line_color
-                        ),
-                        hovertemplate=f"{x_axis}: %{{x}}<br>{y_axis_title}: {hover_template}<extra></extra>"
-                    )
-                )
-
-                # Add SECONDARY trace
-                if secondary_y_axis:
-                    grouped_data_secondary = self._aggregate_data_properly(data, [x_axis], [secondary_y_axis])
-                    if pd.api.types.is_datetime64_any_dtype(grouped_data_secondary[x_axis]):
-                        grouped_data_secondary = grouped_data_secondary.sort_values(by=x_axis)
-
-                    hover_template = "%{y}"
-                    if secondary_metric_type == 'currency':
-                        hover_template = "£%{y:,.2f}"
-                    elif secondary_metric_type == 'percentage':
-                        hover_template = "%{y:.2f}%"
-
-                    # Use SECONDARY AXIS COLOR (separate from grouped colors)
-                    secondary_color = self.style.secondary_axis_color
-
-                    self.fig.add_trace(
-                        go.Scatter(
-                            x=grouped_data_secondary[x_axis],
-                            y=grouped_data_secondary[secondary_y_axis],
-                            mode='lines+markers' if self.style.show_markers else 'lines',
-                            name=secondary_y_axis,
-                            line=dict(
-                                color=secondary_color,
-                                width=self.style.line_width,
-                                shape=self.style.line_shape,
-                                dash='dash'
-                            ),
-                            marker=dict(
-                                size=self.style.marker_size if self.style.show_markers else 0,
-                                color=secondary_color,
-                                symbol='square'
-                            ),
-                            hovertemplate=f"{x_axis}: %{{x}}<br>{secondary_y_axis_title}: {hover_template}<extra></extra>",
-                            yaxis="y2"
-                        )
-                    )
+            grouped_data = self._aggregate_data_properly(data, group_columns, metrics)
+            metric_data = dict.fromkeys(metrics, grouped_data)
+
+            # Groups come from the full aggregate so each group keeps the same color on both axes
+            if len(group_columns) > 1:
+                groups = grouped_data[group_by].unique()
+
+        # Add PRIMARY traces first, then SECONDARY traces on the second y-axis
+        self._add_metric_traces(metric_data[y_axis], x_axis, y_axis, metric_type, y_axis_title, group_by, groups, False)
+        if secondary_y_axis:
+            self._add_metric_traces(metric_data[secondary_y_axis], x_axis, secondary_y_axis, secondary_metric_type, secondary_y_axis_title, group_by, groups, True)
 
         # Set the chart title
         if secondary_y_axis:
@@ -221,55 +88,54 @@ class LineChart:
 
     def _aggregate_data_properly(self, data, group_columns, metrics):
         """Aggregate data using the appropriate method for each metric"""
-        if not self.data_processor:
-            return data.groupby(group_columns)[metrics].sum().reset_index()
-
-        grouped_data = data.groupby(group_columns)
         agg_dict = {}
         for metric in metrics:
-            aggregation_type = self.data_processor.get_aggregation_type(metric)
-            if aggregation_type == 'average':
+            if self.data_processor and self.data_processor.get_aggregation_type(metric) == 'average':
                 agg_dict[metric] = 'mean'
             else:
                 agg_dict[metric] = 'sum'
 
-        result = grouped_data.agg(agg_dict).reset_index()
-        return result
-
-    def _add_grouped_data_with_zero_handling(self, data, x_axis, y_axis, group_by, metric_type, y_axis_title, is_secondary=False):
-        """Add traces for grouped data with zero handling"""
-        grouped_data = self._aggregate_data_properly(data, [x_axis, group_by], [y_axis])
-
-        if pd.api.types.is_datetime64_any_dtype(grouped_data[x_axis]):
-            grouped_data = grouped_data.sort_values(by=[group_by, x_axis])
+        return aggregate_metrics(data, group_columns, agg_dict)
 
-        grouped_data = grouped_data[grouped_data[y_axis] != 0]
-        groups = grouped_data[group_by].unique()
-
-        for i, group_value in enumerate(groups):
-            group_data = grouped_data[grouped_data[group_by] == group_value]
-            group_data = group_data.sort_values(by=x_axis)
-            segments = self._split_into_continuous_segments(group_data, x_axis)
+    def _add_metric_traces(self, grouped_data, x_axis, metric, metric_type, metric_title, group_by=None, groups=None, is_secondary=False):
+        """Add one line per group for a metric, split at gaps when zero values are hidden"""
+        hover_template = "%{y}"
+        if metric_type == 'currency':
+            hover_template = "£%{y:,.2f}"
+        elif metric_type == 'percentage':
+            hover_template = "%{y:.2f}%"
 
-            # Use proper color logic
-            if is_secondary:
-                color = self.style.color_sequence[i % len(self.style.color_sequence)]  # Same as primary group
+        if groups is not None:
+            # Secondary traces use the SAME color as their primary group
+            lines = [
+                (f"{group_value} - {metric}",
+                 self.style.color_sequence[i % len(self.style.color_sequence)],
+                 grouped_data[grouped_data[group_by] == group_value],
+                 f"{group_value}-{metric}")
+                for i, group_value in enumerate(groups)
+            ]
+        else:
+            # Use SECONDARY AXIS COLOR (separate from grouped colors)
+            color = self.style.secondary_axis_color if is_secondary else self.style.line_color
+            lines = [(metric, color, grouped_data, None)]
+
+        for name, color, line_data, legend_group in lines:
+            if self.style.hide_zero_values:
+                line_data = line_data[line_data[metric] != 0]
+                # A group with only zeros gets no line (or legend entry) at all. Its color
+                # index still comes from the full group list, so the other colors don't shift
+                if legend_group and line_data.empty:
+                    continue
+                segments = self._split_into_continuous_segments(line_data, x_axis)
             else:
-                color = self.style.color_sequence[i % len(self.style.color_sequence)]
-
-            hover_template = "%{y}"
-            if metric_type == 'currency':
-                hover_template = "£%{y:,.2f}"
-            elif metric_type == 'percentage':
-                hover_template = "%{y:.2f}%"
+                segments = [line_data]
 
             for j, segment in enumerate(segments):
                 trace_config = {
-                    'x': segment[x_axis],
-                    'y': segment[y_axis],
+                    'x': segment[x_axis].to_numpy(),
+                    'y': segment[metric].to_numpy(),
                     'mode': 'lines+markers' if self.style.show_markers else 'lines',
-                    'name': f"{group_value} - {y_axis}" if j == 0 else f"{group_value} - {y_axis} (cont.)",
-                    'showlegend': j == 0,
+                    'name': name if j == 0 else f"{name} (cont.)",
                     'line': dict(
                         color=color,
                         width=self.style.line_width,
@@ -279,10 +145,15 @@ class LineChart:
                         size=self.style.marker_size if self.style.show_markers else 0,
                         color=color
                     ),
-                    'legendgroup': f"{group_value}-{y_axis}",
-                    'hovertemplate': f"{x_axis}: %{{x}}<br>{y_axis_title}: {hover_template}<extra></extra>"
+                    'hovertemplate': f"{x_axis}: %{{x}}<br>{metric_title}: {hover_template}<extra></extra>"
                 }
 
+                # Continuation segments share the first segment's legend entry
+                if self.style.hide_zero_values:
+                    trace_config['showlegend'] = j == 0
+                    if legend_group:
+                        trace_config['legendgroup'] = legend_group
+
                 if is_secondary:
                     trace_config['yaxis'] = 'y2'
                     trace_config['line']['dash'] = 'dash'
@@ -290,52 +161,6 @@ class LineChart:
 
                 self.fig.add_trace(go.Scatter(**trace_config))
 
-    def _add_ungrouped_data_with_zero_handling(self, data, x_axis, y_axis, metric_type, y_axis_title, is_secondary=False):
-        """Add traces for ungrouped data with zero handling"""
-        filtered_data = data[data[y_axis] != 0]
-        grouped_data = self._aggregate_data_properly(filtered_data, [x_axis], [y_axis])
-
-        if pd.api.types.is_datetime64_any_dtype(grouped_data[x_axis]):
-            grouped_data = grouped_data.sort_values(by=x_axis)
-
-        segments = self._split_into_continuous_segments(grouped_data, x_axis)
-
-        hover_template = "%{y}"
-        if metric_type == 'currency':
-            hover_template = "£%{y:,.2f}"
-        elif metric_type == 'percentage':
-            hover_template = "%{y:.2f}%"
-
-        color = self.style.line_color
-        if is_secondary:
-            color = self.style.secondary_axis_color
-
-        for i, segment in enumerate(segments):
-            trace_config = {
-                'x': segment[x_axis],
-                'y': segment[y_axis],
-                'mode': 'lines+markers' if self.style.show_markers else 'lines',
-                'name': y_axis if i == 0 else f"{y_axis} (cont.)",
-                'showlegend': i == 0,
-                'line': dict(
-                    color=color,
-                    width=self.style.line_width,
-                    shape=self.style.line_shape
-                ),
-                'marker': dict(
-                    size=self.style.marker_size if self.style.show_markers else 0,
-                    color=color
-                ),
-                'hovertemplate': f"{x_axis}: %{{x}}<br>{y_axis_title}: {hover_template}<extra></extra>"
-            }
-
-            if is_secondary:
-                trace_config['yaxis'] = 'y2'
-                trace_config['line']['dash'] = 'dash'
-                trace_config['marker']['symbol'] = 'square'
-
-            self.fig.add_trace(go.Scatter(**trace_config))
-
     def _configure_axes(self, x_axis, y_axis, y_axis_title, metric_type, secondary_y_axis=None, secondary_y_axis_title=None, secondary_metric_type=None):
         """Configure axis titles and formatting based on metric types"""
         yaxis_config = dict(
@@ -415,9 +240,5 @@ class LineChart:
 
     def _apply_style(self):
         if self.fig:
-            self.fig.update_layout(**self.style.get_layout_params())
-
-            if hasattr(self.fig, 'data') and len(self.fig.data) > 0 and hasattr(self.fig.data[0], 'mode'):
-                for trace in self.fig.data:
-                    if hasattr(trace, 'line'):
-                        trace.line.shape = self.style.line_shape
\ No newline at end of file
+            # Trace-level styling (mode, markers, line shape) is set when each trace is built
+            self.fig.update_layout(**self.style.get_layout_params())
\ No newline at end of file
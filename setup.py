@@ -10,6 +10,7 @@ setup(
         "plotly",
         "streamlit",
         "openpyxl",
+        "python-calamine",
     ],
     python_requires=">=3.8",
 )
\ No newline at end of file